@@ -1,22 +1,63 @@
 import psycopg2
+from psycopg2.extras import execute_values
 import uuid
 from datetime import datetime
 import os
 
 import json
 from dotenv import load_dotenv
+import db_pool
+from listing_cache import invalidate_listing
 
 load_dotenv()
 
+MEDIA_TYPES = ['image', 'video', 'virtual_tour', 'floor_plan']
+PROPERTY_TYPES = ['house', 'apartment', 'land', 'commercial']
+LISTING_STATUSES = ['active', 'pending', 'sold', 'rented']
+
+
+def insert_listing_media(cur, listing_id, media, owner_id=None):
+    """Attach any number of media rows to a listing in a single INSERT.
+
+    `media` holds URLs or (url, media_type, caption) tuples; display_order
+    continues after the listing's current last item. When `owner_id` is
+    given, nothing is written unless that user owns the listing. Returns the
+    number of rows written. Callers invalidate the listing cache after they
+    commit, so a concurrent detail view cannot re-cache the old media.
+    """
+    rows = []
+    for order, item in enumerate(media, 1):
+        url, media_type, caption = (item, 'image', None) if isinstance(item, str) else item
+        rows.append((str(uuid.uuid4()), listing_id, owner_id, url, media_type, caption, order))
+    if not rows:
+        return 0
+
+    execute_values(
+        cur,
+        """
+        INSERT INTO listing_media (
+            id, listing_id, url, media_type, caption, display_order, created_at
+        )
+        SELECT v.id::uuid, l.id, v.url, v.media_type, v.caption,
+               COALESCE(last.display_order, 0) + v.ord, NOW()
+        FROM (VALUES %s) AS v(id, listing_id, owner_id, url, media_type, caption, ord)
+        JOIN listings l ON l.id = v.listing_id::uuid
+            AND (v.owner_id IS NULL OR l.user_id = v.owner_id::uuid)
+        LEFT JOIN LATERAL (
+            SELECT MAX(display_order) AS display_order
+            FROM listing_media
+            WHERE listing_id = l.id
+        ) last ON TRUE
+        """,
+        rows,
+        page_size=len(rows)
+    )
+    return cur.rowcount
+
+
 class ListingManager:
     def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        self.conn = db_pool.getconn()
 
     def get_user_id_by_username(self, username):
         try:
@@ -56,6 +97,20 @@ class ListingManager:
             print(f"\nDatabase Error: {e}")
             return None
 
+    def attach_media(self, user_id, listing_id, media):
+        """Attach media to one of the user's listings; returns rows written"""
+        try:
+            with self.conn.cursor() as cur:
+                written = insert_listing_media(cur, listing_id, media, owner_id=user_id)
+                self.conn.commit()
+            if written:
+                invalidate_listing(listing_id)
+            return written
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"\nDatabase Error: {e}")
+            return 0
+
     def fetch_user_listings(self, user_id):
         try:
             with self.conn.cursor() as cur:
@@ -101,4 +156,6 @@ class ListingManager:
             return {"lat": 0.0, "lng": 0.0}
 
     def close(self):
-        self.conn.close()
+        if self.conn is not None:
+            db_pool.putconn(self.conn)
+            self.conn = None
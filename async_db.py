@@ -0,0 +1,326 @@
+"""Asyncio data access for listings, reviews, saved listings and chats.
+
+AsyncRepository runs the same SQL as the blocking modules on asyncpg with its
+own pool, so independent queries can run concurrently:
+
+    repo = AsyncRepository()
+    agency, listings = await asyncio.gather(repo.agency(agency_id), repo.owner_listings(user_id))
+
+SyncRepository wraps it for the blocking CLI: it runs an event loop on a
+background thread and exposes every coroutine method as a plain call.
+"""
+import asyncio
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import asyncpg
+import psycopg2
+from dotenv import load_dotenv
+
+import db_pool
+import query_stats
+from chatsystem import CHAT_LIST_LIMIT, CHAT_PAGE_SIZE, chat_messages_query, user_chats_query
+from dashboard import AGENCY_DASHBOARD_SQL, DASHBOARD_LISTINGS, DASHBOARD_REVIEWS
+from feedbck_system import LISTING_RATING_STATS_SQL, REVIEWS_PAGE_SIZE, listing_reviews_query, user_reviews_query
+from listing_cache import LISTING_DETAILS_SQL
+from listing_search import fuzzy_listings_query, nearby_listings_query, search_listings_query
+
+load_dotenv()
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def to_asyncpg(sql):
+    """Rewrite psycopg2 placeholders (%s, %%) as asyncpg's $1, $2, ... and %"""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group() == "%%" else f"${next(counter)}", sql)
+
+
+def asyncpg_connect_kwargs():
+    """db_pool.connect_kwargs() translated to asyncpg's argument names"""
+    kwargs = db_pool.connect_kwargs()
+    if "dsn" in kwargs:
+        return kwargs
+    return {
+        "host": kwargs["host"],
+        "database": kwargs["dbname"],
+        "user": kwargs["user"],
+        "password": kwargs["password"],
+        "port": kwargs["port"],
+        "ssl": kwargs["sslmode"],
+    }
+
+
+async def _init_connection(conn):
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncRepository:
+    """Async versions of the listing, review, saved-listing and chat queries.
+
+    Rows come back as dicts, like the RealDictCursor queries elsewhere. Each
+    call borrows its own pooled connection, so calls gathered together run
+    in parallel on the server.
+    """
+
+    def __init__(self, min_size=None, max_size=None, **connect_kwargs):
+        self.min_size = min_size if min_size is not None else int(os.getenv("DB_POOL_MIN", "1"))
+        self.max_size = max_size or int(os.getenv("DB_POOL_MAX", "10"))
+        self._connect_kwargs = connect_kwargs or asyncpg_connect_kwargs()
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        init=_init_connection,
+                        **self._connect_kwargs
+                    )
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _query(self, method, sql, params, caller):
+        """Run a pool method, recording it against the caller's line when profiling"""
+        pool = await self.pool()
+        run = getattr(pool, method)
+        if not query_stats.enabled():
+            return await run(to_asyncpg(sql), *params)
+        key = query_stats.call_site(caller)
+        started = time.perf_counter()
+        try:
+            result = await run(to_asyncpg(sql), *params)
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError):
+            query_stats.record(key, time.perf_counter() - started, error=True)
+            raise
+        elapsed = time.perf_counter() - started
+        if method == "fetch":
+            rows = result
+        elif method == "fetchrow" and result is not None:
+            rows = [result]
+        else:
+            rows = []
+        query_stats.record(key, elapsed, rows=len(rows), nbytes=query_stats.row_bytes(rows))
+        query_stats.log_slow(key, elapsed, sql)
+        return result
+
+    async def fetch(self, sql, params=()):
+        return [dict(row) for row in await self._query("fetch", sql, params, sys._getframe(1))]
+
+    async def fetchrow(self, sql, params=()):
+        row = await self._query("fetchrow", sql, params, sys._getframe(1))
+        return dict(row) if row is not None else None
+
+    async def execute(self, sql, params=()):
+        return await self._query("execute", sql, params, sys._getframe(1))
+
+    # Listings
+
+    async def listing_details(self, listing_id):
+        """Listing row with its ordered `media` list"""
+        return await self.fetchrow(LISTING_DETAILS_SQL, (listing_id,))
+
+    async def owner_listings(self, user_id):
+        return await self.fetch(
+            """
+            SELECT id, title, price, property_type, status, created_at
+            FROM listings
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+            """,
+            (user_id,)
+        )
+
+    async def active_listings_page(self, after=None, limit=20):
+        """Active listings newest first, seeking past the (created_at, id) key"""
+        sql = """
+            SELECT id, title, price, property_type, status, created_at
+            FROM listings
+            WHERE status = 'active'
+        """
+        params = []
+        if after:
+            sql += " AND (created_at, id) < (%s::timestamptz, %s::uuid)"
+            params.extend(after)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(limit)
+        return await self.fetch(sql, params)
+
+    async def search_listings(self, query, filters=None, limit=20):
+        query = (query or "").strip()
+        if not query:
+            return []
+        results = await self.fetch(*search_listings_query(query, filters, limit))
+        if len(results) < limit:
+            exclude_ids = [row["id"] for row in results]
+            results += await self.fetch(*fuzzy_listings_query(query, filters, limit - len(results), exclude_ids))
+        return results
+
+    async def nearby_listings(self, lat, lng, radius_m=None, bbox=None, filters=None, limit=20):
+        return await self.fetch(*nearby_listings_query(lat, lng, radius_m, bbox, filters, limit))
+
+    async def agency(self, agency_id):
+        return await self.fetchrow(
+            """
+            SELECT id, user_id, name, license_number, bio, verified, profile_image_url, created_at
+            FROM agencies
+            WHERE id = %s
+            """,
+            (agency_id,)
+        )
+
+    # Reviews
+
+    async def user_reviews(self, user_id, limit=REVIEWS_PAGE_SIZE, before=None):
+        return await self.fetch(*user_reviews_query(user_id, limit, before))
+
+    async def listing_reviews(self, listing_id, limit=REVIEWS_PAGE_SIZE, before=None):
+        return await self.fetch(*listing_reviews_query(listing_id, limit, before))
+
+    async def listing_rating_stats(self, listing_id):
+        row = await self.fetchrow(LISTING_RATING_STATS_SQL, (listing_id,))
+        if not row:
+            return {"count": 0, "sum": 0, "histogram": [0, 0, 0, 0, 0]}
+        return {
+            "count": row["review_count"],
+            "sum": row["rating_sum"],
+            "histogram": [row[f"stars_{n}"] for n in range(1, 6)],
+        }
+
+    # Saved listings
+
+    async def saved_listings(self, user_id):
+        return await self.fetch(
+            """
+            SELECT s.id, s.listing_id, l.title, l.price, s.notes, s.created_at, s.updated_at
+            FROM saved_listings s
+            JOIN listings l ON l.id = s.listing_id
+            WHERE s.user_id = %s
+            ORDER BY s.updated_at DESC
+            """,
+            (user_id,)
+        )
+
+    async def save_listing(self, user_id, listing_id, notes=None):
+        await self.execute(
+            """
+            INSERT INTO saved_listings (user_id, listing_id, notes, created_at, updated_at)
+            VALUES (%s, %s, %s, NOW(), NOW())
+            ON CONFLICT (user_id, listing_id) DO UPDATE
+            SET notes = EXCLUDED.notes, updated_at = NOW()
+            """,
+            (user_id, listing_id, notes)
+        )
+
+    # Chats
+
+    async def user_chats(self, user_id, limit=CHAT_LIST_LIMIT, after=None):
+        """One page of conversations, most recent first, after a (last_message_at, conversation_id) key"""
+        return await self.fetch(*user_chats_query(user_id, limit, after))
+
+    async def chat_messages(self, conversation_id, limit=CHAT_PAGE_SIZE, before=None):
+        """One page of messages, oldest first"""
+        rows = await self.fetch(*chat_messages_query(conversation_id, limit, before))
+        rows.reverse()
+        return rows
+
+    async def unread_count(self, user_id):
+        row = await self.fetchrow(
+            "SELECT COALESCE(SUM(unread_count), 0) AS unread FROM conversation_inbox WHERE user_id = %s",
+            (user_id,)
+        )
+        return row["unread"]
+
+    # Screens that used to be several sequential round trips
+
+    async def agency_overview(self, agency_id, owner_id):
+        """Agency profile and its listings, fetched concurrently"""
+        agency, listings = await asyncio.gather(self.agency(agency_id), self.owner_listings(owner_id))
+        return {"agency": agency, "listings": listings}
+
+    async def agency_dashboard(self, agency_id, listings=DASHBOARD_LISTINGS, reviews=DASHBOARD_REVIEWS):
+        """Every dashboard panel in one query (see dashboard.AGENCY_DASHBOARD_SQL)"""
+        return await self._query("fetchval", AGENCY_DASHBOARD_SQL, (agency_id, listings, reviews), sys._getframe(0))
+
+
+class SyncRepository:
+    """Blocking facade over AsyncRepository for the CLI.
+
+    Calls are run on a private event loop thread; `repo.owner_listings(uid)`
+    blocks until the coroutine finishes and returns its result. asyncpg
+    errors are re-raised as psycopg2 ones (lost connections, interface
+    errors and timeouts as OperationalError/InterfaceError), so callers
+    handle both layers with `except psycopg2.Error`.
+    """
+
+    def __init__(self, repository=None, timeout=None):
+        self.timeout = timeout or float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-db", daemon=True)
+        self._thread.start()
+        self.repository = repository or AsyncRepository()
+
+    def run(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            raise psycopg2.OperationalError(f"query timed out after {self.timeout:g}s") from e
+        except (asyncpg.PostgresConnectionError, OSError) as e:
+            raise psycopg2.OperationalError(str(e) or type(e).__name__) from e
+        except asyncpg.InterfaceError as e:
+            raise psycopg2.InterfaceError(str(e)) from e
+        except asyncpg.PostgresError as e:
+            raise psycopg2.DatabaseError(str(e)) from e
+
+    def __getattr__(self, name):
+        if name == "repository":
+            raise AttributeError(name)
+        method = getattr(self.repository, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            return self.run(method(*args, **kwargs))
+        return call
+
+    def close(self):
+        self.run(self.repository.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_sync_repository = None
+_sync_lock = threading.Lock()
+
+
+def get_sync_repository():
+    """Process-wide blocking repository, created on first use"""
+    global _sync_repository
+    with _sync_lock:
+        if _sync_repository is None:
+            _sync_repository = SyncRepository()
+        return _sync_repository
+
+
+def close_sync_repository():
+    global _sync_repository
+    with _sync_lock:
+        if _sync_repository is not None:
+            _sync_repository.close()
+            _sync_repository = None
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", str(os.cpu_count() or 1)))
+
+
+def hash_cost(stored_hash):
+    """Work factor encoded in a bcrypt hash ($2b$12$... -> 12), or None if unreadable"""
+    try:
+        return int(stored_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class AuthService:
+    """bcrypt hashing and verification on a worker pool with a configurable cost.
+
+    bcrypt releases the GIL while it works, so the pool both keeps the CLI
+    thread free and lets concurrent logins use every core.
+    """
+
+    def __init__(self, rounds=None, workers=None):
+        self.rounds = rounds or BCRYPT_ROUNDS
+        self.workers = workers or AUTH_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def _verify(self, password, stored_hash):
+        try:
+            return bcrypt.checkpw(password.encode(), stored_hash.encode())
+        except ValueError:
+            return False
+
+    def hash_password_async(self, password):
+        return self._executor.submit(self._hash, password)
+
+    def hash_password(self, password):
+        return self.hash_password_async(password).result()
+
+    def verify_async(self, password, stored_hash):
+        return self._executor.submit(self._verify, password, stored_hash)
+
+    def verify(self, password, stored_hash):
+        return self.verify_async(password, stored_hash).result()
+
+    def needs_rehash(self, stored_hash):
+        cost = hash_cost(stored_hash)
+        return cost is None or cost < self.rounds
+
+    def rehash_async(self, password, store):
+        """Hash at the current cost in the background and pass the result to `store(new_hash)`"""
+        return self._executor.submit(lambda: store(self._hash(password)))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_service = None
+
+
+def get_auth_service():
+    global _service
+    if _service is None:
+        _service = AuthService()
+    return _service
@@ -0,0 +1,841 @@
+"""Query benchmarks against a seeded local database.
+
+Point DATABASE_URL (or the DB_* variables) at a disposable local Postgres
+with schema.sql applied before running, e.g.
+
+    python benchmark.py geo --rows 200000
+    python benchmark.py search --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+import db_pool
+import query_registry
+from async_db import AsyncRepository
+from auth import AuthService
+from chat_listener import ChatListener
+from chatsystem import ChatSystem, USER_CHATS_SQL, chat_messages_query, user_chats_query
+from cli_app import LOGIN_SQL, USER_CONTEXT_SQL
+from dashboard import AGENCY_DASHBOARD_SQL
+from feedbck_system import LISTING_RATING_STATS_SQL, user_reviews_query
+from listing_cache import ListingCache, get_listing_details
+from listing_search import fuzzy_listings_query, nearby_listings_query, search_listings, search_listings_query
+from session_store import SessionStore
+
+BENCH_USERNAME = "bench_seed_user"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies):
+    """Print p50/p95/p99 for a list of latencies in seconds"""
+    ms = [t * 1000 for t in latencies]
+    print(f"{name:<40} n={len(ms):<6} mean={statistics.mean(ms):8.2f}ms "
+          f"p50={percentile(ms, 50):8.2f}ms p95={percentile(ms, 95):8.2f}ms "
+          f"p99={percentile(ms, 99):8.2f}ms")
+
+
+def timed(conn, sql, params, repeat):
+    latencies = []
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            latencies.append(time.perf_counter() - start)
+    conn.rollback()
+    return latencies
+
+
+def explain(conn, sql, params):
+    """Return the root node of EXPLAIN (ANALYZE, BUFFERS) for a query"""
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0]
+    conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def uses_index(plan, index_name):
+    return any(node.get("Index Name") == index_name for node in plan_nodes(plan))
+
+
+def seed_user(conn, username=BENCH_USERNAME):
+    """Id of the user that owns every seeded benchmark row"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO users (username, password_hash) VALUES (%s, 'benchmark')
+            ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+            RETURNING id
+            """,
+            (username,)
+        )
+        user_id = cur.fetchone()[0]
+    conn.commit()
+    return user_id
+
+
+def seed_listings(conn, user_id, rows):
+    """Bulk-insert listings scattered around Nairobi for the benchmark user"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO listings (
+                user_id, title, description, price, property_type, bedrooms,
+                bathrooms, square_feet, address, location
+            )
+            SELECT %s,
+                   'Bench listing ' || g,
+                   'Seeded benchmark listing number ' || g,
+                   (random() * 20000000)::numeric(12,2),
+                   (ARRAY['house', 'apartment', 'land', 'commercial'])[1 + g %% 4],
+                   1 + g %% 6,
+                   1 + g %% 4,
+                   400 + g %% 5000,
+                   jsonb_build_object('street', g || ' Bench Road', 'city', 'Nairobi', 'county', 'Nairobi'),
+                   ST_SetSRID(ST_MakePoint(36.5 + random() * 0.6, -1.6 + random() * 0.6), 4326)::geography
+            FROM generate_series(1, %s) AS g
+            """,
+            (user_id, rows)
+        )
+        cur.execute("ANALYZE listings")
+    conn.commit()
+
+
+def seed_media(conn, user_id, per_listing):
+    """Attach `per_listing` ordered image rows to every seeded listing"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO listing_media (listing_id, url, media_type, display_order)
+            SELECT l.id, 'https://cdn.example.com/' || l.id || '/' || g || '.jpg', 'image', g
+            FROM listings l
+            CROSS JOIN generate_series(1, %s) AS g
+            WHERE l.user_id = %s
+            """,
+            (per_listing, user_id)
+        )
+        cur.execute("ANALYZE listing_media")
+    conn.commit()
+
+
+def seed_reviews(conn, user_id):
+    """One review by the benchmark user on each seeded listing"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO reviews (listing_id, reviewer_id, rating, comment)
+            SELECT id, %s, 1 + (random() * 4)::int, 'Seeded benchmark review'
+            FROM listings
+            WHERE user_id = %s
+            """,
+            (user_id, user_id)
+        )
+        cur.execute("ANALYZE reviews")
+    conn.commit()
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM listings WHERE user_id IN (SELECT id FROM users WHERE username LIKE %s)",
+            (BENCH_USERNAME + "%",)
+        )
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (BENCH_USERNAME + "%",))
+    conn.commit()
+
+
+def bench_geo(args):
+    """Radius, bounding-box and k-NN listing lookups on the GIST location index"""
+    lat, lng = -1.286389, 36.817223
+    cases = [
+        ("k-NN nearest 20", nearby_listings_query(lat, lng)),
+        ("radius 2 km", nearby_listings_query(lat, lng, radius_m=2000)),
+        ("radius 5 km + filters", nearby_listings_query(
+            lat, lng, radius_m=5000, filters={'property_type': 'house', 'bedrooms': 3, 'price_max': 10000000})),
+        ("bbox ~3 km", nearby_listings_query(lat, lng, bbox=(lat - 0.015, lng - 0.015, lat + 0.015, lng + 0.015))),
+    ]
+
+    with db_pool.connection() as conn:
+        if args.rows:
+            print(f"Seeding {args.rows} listings...")
+            seed_listings(conn, seed_user(conn), args.rows)
+        try:
+            for name, (sql, params) in cases:
+                plan = explain(conn, sql, params)
+                indexed = uses_index(plan, "idx_listings_location")
+                print(f"{name}: plan root={plan['Node Type']}, "
+                      f"idx_listings_location={'yes' if indexed else 'NO'}, "
+                      f"execution={plan.get('Actual Total Time', 0):.2f}ms")
+                report(name, timed(conn, sql, params, args.repeat))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def seed_search_listings(conn, user_id, rows):
+    """Bulk-insert listings with varied titles, descriptions and addresses for text search"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO listings (
+                user_id, title, description, price, property_type, bedrooms,
+                bathrooms, square_feet, address
+            )
+            SELECT %s,
+                   adjective[a] || ' ' || bedrooms || '-bedroom ' || kind[k] || ' in ' || area[r],
+                   'A ' || lower(adjective[1 + floor(random() * 10)::int]) || ' home with ' || feature[f1]
+                       || ' and ' || feature[f2] || ', close to ' || area[1 + floor(random() * 16)::int],
+                   (random() * 20000000)::numeric(12,2),
+                   kind[k],
+                   bedrooms,
+                   1 + g %% 4,
+                   400 + g %% 5000,
+                   jsonb_build_object('street', g || ' ' || area[r] || ' Road', 'city', 'Nairobi', 'county', 'Nairobi')
+            FROM generate_series(1, %s) AS g,
+                 (SELECT ARRAY['Spacious', 'Modern', 'Cosy', 'Luxury', 'Affordable', 'Renovated',
+                               'Furnished', 'Bright', 'Quiet', 'Elegant'] AS adjective,
+                         ARRAY['house', 'apartment', 'land', 'commercial'] AS kind,
+                         ARRAY['Kilimani', 'Westlands', 'Karen', 'Lavington', 'Kileleshwa', 'Runda',
+                               'Parklands', 'Langata', 'Embakasi', 'Kasarani', 'Ruaka', 'Syokimau',
+                               'Gigiri', 'Muthaiga', 'Ngong', 'Rongai'] AS area,
+                         ARRAY['a swimming pool', 'a rooftop terrace', 'a borehole', 'solar water heating',
+                               'a backup generator', 'a gym', 'a garden', 'servant quarters',
+                               'a fireplace', 'a balcony', 'secure parking', 'fibre internet'] AS feature) AS vocab,
+                 -- Correlated through g, so the picks are drawn again for every row
+                 LATERAL (SELECT 1 + g %% 6 AS bedrooms,
+                                 1 + floor(random() * 10)::int AS a, 1 + floor(random() * 4)::int AS k,
+                                 1 + floor(random() * 16)::int AS r, 1 + floor(random() * 12)::int AS f1,
+                                 1 + floor(random() * 12)::int AS f2) AS pick
+            """,
+            (user_id, rows)
+        )
+        cur.execute("ANALYZE listings")
+    conn.commit()
+
+
+def bench_search(args):
+    """Ranked full-text search_listings() with its trigram fallback against the 50 ms target"""
+    cases = [
+        ("rare terms", "borehole fireplace Runda", None),
+        ("common terms", "apartment Kilimani", None),
+        ("common terms + filters", "apartment Kilimani",
+         {'property_type': 'apartment', 'bedrooms': 3, 'price_max': 10000000}),
+        ("typo (trigram only)", "Spacious 3-bedroom apartmnt in Kilimanii", None),
+        ("short typo (trigram only)", "Lavingtn hous", None),
+    ]
+
+    with db_pool.connection() as conn:
+        if args.rows:
+            print(f"Seeding {args.rows} listings...")
+            seed_search_listings(conn, seed_user(conn), args.rows)
+            vacuum_analyze(conn, "listings")
+        try:
+            for name, query, filters in cases:
+                plans = [explain(conn, *search_listings_query(query, filters))]
+                fts_rows = plans[0].get("Actual Rows", 0)
+                if fts_rows < 20:
+                    plans.append(explain(conn, *fuzzy_listings_query(query, filters, 20 - fts_rows)))
+                indexes = [index for index in ("idx_listings_search", "idx_listings_title_trgm")
+                           if any(uses_index(plan, index) for plan in plans)]
+                latencies = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    rows = search_listings(query, filters, conn=conn)
+                    latencies.append(time.perf_counter() - started)
+                conn.rollback()
+                execution_times = [f"{plan.get('Actual Total Time', 0):.2f}" for plan in plans]
+                p95 = percentile(latencies, 95) * 1000
+                print(f"{name}: {len(rows)} results, indexes={', '.join(indexes) or 'NONE'}, "
+                      f"execution={' + '.join(execution_times)}ms, "
+                      f"p95 {'within' if p95 <= args.target_ms else 'OVER'} {args.target_ms:g}ms")
+                report(name, latencies)
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+# get_user_reviews before the LATERAL rewrite, kept for plan comparison
+LEGACY_USER_REVIEWS_SQL = """
+    SELECT r.id, l.title, r.rating, r.comment, r.created_at,
+           ARRAY_AGG(lm.url) AS media_urls
+    FROM reviews r
+    JOIN listings l ON r.listing_id = l.id
+    LEFT JOIN listing_media lm ON lm.listing_id = l.id AND lm.id IN (
+        SELECT id FROM listing_media
+        WHERE listing_id = l.id
+        ORDER BY display_order
+        LIMIT 3
+    )
+    WHERE r.reviewer_id = %s
+    GROUP BY r.id, l.title
+    ORDER BY r.created_at DESC
+"""
+
+
+def bench_reviews_media(args):
+    """Correlated-subquery vs LATERAL top-N review+media queries"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        print(f"Seeding {args.listings} listings x {args.media} media rows...")
+        seed_listings(conn, user_id, args.listings)
+        seed_media(conn, user_id, args.media)
+        seed_reviews(conn, user_id)
+        try:
+            cases = [
+                ("legacy correlated IN (all reviews)", (LEGACY_USER_REVIEWS_SQL, [user_id]), args.legacy_repeat),
+                ("LATERAL top-3 (all reviews)", user_reviews_query(user_id, limit=args.listings), args.repeat),
+                ("LATERAL top-3 (first page)", user_reviews_query(user_id), args.repeat),
+            ]
+            for name, (sql, params), repeat in cases:
+                plan = explain(conn, sql, params)
+                print(f"{name}: execution={plan.get('Actual Total Time', 0):.2f}ms, "
+                      f"shared buffers hit={plan.get('Shared Hit Blocks', 0)}, "
+                      f"idx_listing_media_listing_order="
+                      f"{'yes' if uses_index(plan, 'idx_listing_media_listing_order') else 'no'}")
+                report(name, timed(conn, sql, params, repeat))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def seed_conversation(conn, user_a, user_b):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO conversations (participant_1, participant_2)
+            VALUES (LEAST(%s::uuid, %s::uuid), GREATEST(%s::uuid, %s::uuid))
+            ON CONFLICT (participant_1, participant_2) DO UPDATE SET participant_1 = EXCLUDED.participant_1
+            RETURNING id
+            """,
+            (user_a, user_b, user_a, user_b)
+        )
+        conversation_id = cur.fetchone()[0]
+    conn.commit()
+    return conversation_id
+
+
+def bench_chat_notify(args):
+    """End-to-end LISTEN/NOTIFY delivery latency for chat messages"""
+    with db_pool.connection() as conn:
+        sender = seed_user(conn)
+        receiver = seed_user(conn, BENCH_USERNAME + "_peer")
+        conversation_id = seed_conversation(conn, sender, receiver)
+
+        sent_at = {}
+        latencies = []
+        received = threading.Event()
+
+        def on_message(payload):
+            started = sent_at.pop(payload["message"], None)
+            if started is not None:
+                latencies.append(time.perf_counter() - started)
+            if not sent_at:
+                received.set()
+
+        listener = ChatListener([conversation_id], on_message, poll_interval=0.1)
+        listener.start()
+        try:
+            with conn.cursor() as cur:
+                for i in range(args.messages):
+                    body = f"bench message {i}"
+                    received.clear()
+                    sent_at[body] = time.perf_counter()
+                    cur.execute(
+                        "INSERT INTO chats (conversation_id, sender_id, message) VALUES (%s, %s, %s)",
+                        (conversation_id, sender, body)
+                    )
+                    conn.commit()
+                    received.wait(5)
+            missing = len(sent_at)
+            print(f"delivered {len(latencies)}/{args.messages} notifications, {missing} missing")
+            if latencies:
+                report("commit -> listener callback", latencies)
+        finally:
+            listener.stop()
+            if not args.keep:
+                cleanup(conn)
+
+
+# list_user_chats before conversation_inbox membership, kept for plan comparison
+LEGACY_USER_CHATS_SQL = """
+    SELECT c.id, u1.username AS contact_name
+    FROM conversations c
+    JOIN users u1 ON (CASE
+        WHEN c.participant_1 = %s THEN c.participant_2
+        ELSE c.participant_1 END) = u1.id
+    WHERE c.participant_1 = %s OR c.participant_2 = %s
+"""
+
+
+def vacuum_analyze(conn, *tables):
+    """VACUUM ANALYZE so the visibility map allows index-only scans"""
+    conn.commit()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for table in tables:
+                cur.execute(f"VACUUM ANALYZE {table}")
+    finally:
+        conn.autocommit = False
+
+
+def bench_conversations(args):
+    """Conversation list for a user with 10k+ threads: OR-scan vs inbox membership index"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        print(f"Seeding {args.conversations} conversations for one user...")
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH peers AS (
+                    INSERT INTO users (username, password_hash)
+                    SELECT %s || '_peer_' || g, 'benchmark' FROM generate_series(1, %s) AS g
+                    RETURNING id
+                )
+                INSERT INTO conversations (participant_1, participant_2)
+                SELECT LEAST(%s::uuid, id), GREATEST(%s::uuid, id) FROM peers
+                """,
+                (BENCH_USERNAME, args.conversations, user_id, user_id)
+            )
+        conn.commit()
+        vacuum_analyze(conn, "users", "conversations", "conversation_inbox")
+        try:
+            cases = [
+                ("legacy OR-scan (all threads)", LEGACY_USER_CHATS_SQL, (user_id, user_id, user_id)),
+                ("inbox membership (all threads)", USER_CHATS_SQL, (user_id, args.conversations)),
+                ("inbox membership (latest 50)", USER_CHATS_SQL, (user_id, 50)),
+            ]
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT last_message_at, conversation_id FROM conversation_inbox WHERE user_id = %s "
+                    "ORDER BY last_message_at DESC NULLS LAST, conversation_id DESC OFFSET %s LIMIT 1",
+                    (user_id, args.conversations // 2)
+                )
+                middle = cur.fetchone()
+            conn.rollback()
+            if middle:
+                cases.append(("inbox membership (50 after a mid-list key)",
+                              *user_chats_query(user_id, 50, after=middle)))
+            for name, sql, params in cases:
+                plan = explain(conn, sql, params)
+                print(f"{name}: execution={plan.get('Actual Total Time', 0):.2f}ms, "
+                      f"inbox index={'yes' if uses_index(plan, 'idx_conversation_inbox_recent') else 'no'}")
+                report(name, timed(conn, sql, params, args.repeat))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def bench_conversation_race(args):
+    """Hammer get_or_create_conversation from many threads; expect one row and no errors per pair"""
+    pool = db_pool.ConnectionPool(minconn=0, maxconn=args.threads, **db_pool.connect_kwargs())
+    failures = 0
+    try:
+        with pool.connection() as conn:
+            user_ids = {}
+            for side in ("a", "b"):
+                name = f"{BENCH_USERNAME}_race_{side}"
+                user_ids[name] = seed_user(conn, name)
+        (name_a, id_a), (name_b, id_b) = user_ids.items()
+
+        for round_no in range(1, args.rounds + 1):
+            barrier = threading.Barrier(args.threads)
+            results, errors = [], []
+            latencies = []
+
+            def worker(index):
+                # Half the threads start the chat from each side
+                me, them = (id_a, name_b) if index % 2 else (id_b, name_a)
+                try:
+                    with pool.connection() as conn:
+                        chat = ChatSystem(conn, me)
+                        barrier.wait()
+                        started = time.perf_counter()
+                        results.append(chat.get_or_create_conversation(me, them))
+                        latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT COUNT(*) FROM conversations
+                        WHERE participant_1 = LEAST(%s::uuid, %s::uuid)
+                          AND participant_2 = GREATEST(%s::uuid, %s::uuid)
+                        """,
+                        (id_a, id_b, id_a, id_b)
+                    )
+                    rows = cur.fetchone()[0]
+                    cur.execute(
+                        "DELETE FROM conversations WHERE participant_1 = LEAST(%s::uuid, %s::uuid) "
+                        "AND participant_2 = GREATEST(%s::uuid, %s::uuid)",
+                        (id_a, id_b, id_a, id_b)
+                    )
+                conn.commit()
+
+            ok = rows == 1 and not errors and len(set(results)) == 1 and None not in results
+            failures += not ok
+            print(f"round {round_no}: threads={args.threads} rows={rows} distinct ids={len(set(results))} "
+                  f"errors={len(errors)} {'OK' if ok else 'FAIL'}")
+            for e in errors[:3]:
+                print(f"  {type(e).__name__}: {e}")
+            report("get_or_create_conversation", latencies or [0.0])
+    finally:
+        if not args.keep:
+            with pool.connection() as conn:
+                cleanup(conn)
+        pool.closeall()
+    print("PASS" if not failures else f"FAIL ({failures} rounds)")
+    if failures:
+        raise SystemExit(1)
+
+
+LEGACY_LOGIN_STATEMENTS = [
+    ("SELECT id, password_hash, is_agent FROM users WHERE username = %s", "username"),
+    ("SELECT 1 FROM agencies WHERE user_id = %s", "id"),
+    ("SELECT username, email, phone, password_hash, is_agent, created_at, last_active "
+     "FROM users WHERE id = %s", "id"),
+    ("SELECT name, license_number, bio, verified, profile_image_url, created_at "
+     "FROM agencies WHERE user_id = %s", "id"),
+]
+
+
+def bench_login(args):
+    """Database work per login: the old per-menu lookups vs LOGIN_SQL plus SessionStore.create (2 round trips)"""
+    # No secret: create() still stamps last_active but writes no session file
+    sessions = SessionStore(secret=None)
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        keys = {"username": BENCH_USERNAME, "id": user_id}
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                legacy, fast = [], []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    for sql, key in LEGACY_LOGIN_STATEMENTS:
+                        cur.execute(sql, (keys[key],))
+                        cur.fetchall()
+                    legacy.append(time.perf_counter() - started)
+
+                    # The read runs before bcrypt and the write after it, as in RealEstateCLI.login
+                    started = time.perf_counter()
+                    cur.execute(LOGIN_SQL, (BENCH_USERNAME,))
+                    cur.fetchall()
+                    sessions.create(conn, user_id)
+                    fast.append(time.perf_counter() - started)
+                report(f"legacy ({len(LEGACY_LOGIN_STATEMENTS)} round trips)", legacy)
+                report("LOGIN_SQL + SessionStore.create (2 round trips)", fast)
+                report("USER_CONTEXT_SQL (cache refill)", timed(conn, USER_CONTEXT_SQL, (user_id,), args.repeat))
+        finally:
+            conn.autocommit = False
+            if not args.keep:
+                cleanup(conn)
+
+
+def bench_listing_cache(args):
+    """Explorer detail views: two uncached queries vs the LRU+TTL listing cache"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        print(f"Seeding {args.listings} listings x {args.media} media rows...")
+        seed_listings(conn, user_id, args.listings)
+        seed_media(conn, user_id, args.media)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM listings WHERE user_id = %s", (user_id,))
+                ids = [row[0] for row in cur.fetchall()]
+                # Users bounce between a handful of listings: 80% of views hit the first 10%
+                hot = ids[:max(1, len(ids) // 10)]
+                views = [hot[i % len(hot)] if i % 5 else ids[i % len(ids)] for i in range(args.repeat)]
+
+                legacy = []
+                for listing_id in views:
+                    started = time.perf_counter()
+                    cur.execute("SELECT * FROM listings WHERE id = %s", (listing_id,))
+                    cur.fetchone()
+                    cur.execute(
+                        "SELECT url, media_type, caption FROM listing_media WHERE listing_id = %s ORDER BY display_order",
+                        (listing_id,)
+                    )
+                    cur.fetchall()
+                    legacy.append(time.perf_counter() - started)
+            conn.rollback()
+            report("uncached (listing + media queries)", legacy)
+
+            cache = ListingCache(max_entries=args.entries, ttl=300)
+            cached = []
+            for listing_id in views:
+                started = time.perf_counter()
+                get_listing_details(conn, listing_id, cache=cache)
+                cached.append(time.perf_counter() - started)
+            conn.rollback()
+            report("listing cache", cached)
+            print("cache stats:", json.dumps(cache.stats()))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def bench_async_overview(args):
+    """Agency profile + listings: sequential psycopg2 queries vs asyncio.gather on asyncpg"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        seed_listings(conn, user_id, args.listings)
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO agencies (user_id, name) VALUES (%s, 'Bench Agency') RETURNING id",
+                (user_id,)
+            )
+            agency_id = cur.fetchone()[0]
+        conn.commit()
+        try:
+            sequential = []
+            with conn.cursor() as cur:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    cur.execute("SELECT * FROM agencies WHERE id = %s", (agency_id,))
+                    cur.fetchone()
+                    cur.execute(
+                        "SELECT id, title, price, property_type, status, created_at "
+                        "FROM listings WHERE user_id = %s ORDER BY created_at DESC",
+                        (user_id,)
+                    )
+                    cur.fetchall()
+                    sequential.append(time.perf_counter() - started)
+            conn.rollback()
+            report("psycopg2 sequential", sequential)
+
+            async def run_gathered():
+                repo = AsyncRepository(min_size=2, max_size=4)
+                latencies = []
+                try:
+                    await repo.agency_overview(agency_id, user_id)
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        await repo.agency_overview(agency_id, user_id)
+                        latencies.append(time.perf_counter() - started)
+                finally:
+                    await repo.close()
+                return latencies
+
+            report("asyncpg gathered", asyncio.run(run_gathered()))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def bench_dashboard(args):
+    """Agency screen: one query per panel (and per listing rating) vs the single dashboard query"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        seed_listings(conn, user_id, args.listings)
+        seed_reviews(conn, user_id)
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO agencies (user_id, name) VALUES (%s, 'Bench Agency') RETURNING id",
+                (user_id,)
+            )
+            agency_id = cur.fetchone()[0]
+        conn.commit()
+        try:
+            legacy = []
+            with conn.cursor() as cur:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    cur.execute("SELECT * FROM agencies WHERE id = %s", (agency_id,))
+                    cur.fetchone()
+                    cur.execute("SELECT id, title, status FROM listings WHERE user_id = %s", (user_id,))
+                    listings = cur.fetchall()
+                    for listing in listings[:5]:
+                        cur.execute(
+                            "SELECT review_count, rating_sum FROM listing_rating_stats WHERE listing_id = %s",
+                            (listing[0],)
+                        )
+                        cur.fetchone()
+                    cur.execute("SELECT SUM(unread_count) FROM conversation_inbox WHERE user_id = %s", (user_id,))
+                    cur.fetchone()
+                    cur.execute(
+                        "SELECT r.* FROM reviews r JOIN listings l ON l.id = r.listing_id "
+                        "WHERE l.user_id = %s ORDER BY r.created_at DESC LIMIT 3",
+                        (user_id,)
+                    )
+                    cur.fetchall()
+                    legacy.append(time.perf_counter() - started)
+            conn.rollback()
+            report("panel by panel (9 round trips)", legacy)
+            report("AGENCY_DASHBOARD_SQL (1 round trip)",
+                   timed(conn, AGENCY_DASHBOARD_SQL, (agency_id, 5, 3), args.repeat))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def planning_time(conn, sql, params):
+    """Planning Time (ms) Postgres reports for one execution of `sql`"""
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]
+    conn.rollback()
+    return plan.get("Planning Time", 0.0)
+
+
+def bench_prepared(args):
+    """Hot queries re-sent as text every call vs PREPAREd once per connection through query_registry"""
+    with db_pool.connection() as conn:
+        user_id = seed_user(conn)
+        seed_listings(conn, user_id, args.listings)
+        seed_reviews(conn, user_id)
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM listings WHERE user_id = %s LIMIT 1", (user_id,))
+            listing_id = cur.fetchone()[0]
+        conn.commit()
+        peer_id = seed_user(conn, f"{BENCH_USERNAME}_peer")
+        conversation_id = seed_conversation(conn, user_id, peer_id)
+        try:
+            cases = [
+                ("user_context", USER_CONTEXT_SQL, (user_id,)),
+                ("chat_messages_latest", chat_messages_query(None)[0], (conversation_id, 20)),
+                ("listing_rating_stats", LISTING_RATING_STATS_SQL, (listing_id,)),
+            ]
+            for name, sql, params in cases:
+                print(f"{name}: planning time per text execution={planning_time(conn, sql, params):.3f}ms")
+                report(f"{name} (text)", timed(conn, sql, params, args.repeat))
+
+                prepared = []
+                with conn.cursor() as cur:
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        query_registry.execute(cur, name, params)
+                        cur.fetchall()
+                        prepared.append(time.perf_counter() - started)
+                conn.rollback()
+                report(f"{name} (prepared)", prepared)
+            print("registry stats:", json.dumps(query_registry.stats(), indent=2))
+        finally:
+            if not args.keep:
+                cleanup(conn)
+
+
+def bench_auth(args):
+    """bcrypt verifications/sec per core and across the auth worker pool at each cost (no database needed)"""
+    password = "correct horse battery staple"
+    for rounds in args.costs:
+        auth = AuthService(rounds=rounds, workers=args.workers)
+        try:
+            stored_hash = auth.hash_password(password)
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.logins):
+                t0 = time.perf_counter()
+                auth.verify(password, stored_hash)
+                latencies.append(time.perf_counter() - t0)
+            single = args.logins / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            futures = [auth.verify_async(password, stored_hash) for _ in range(args.logins * 4)]
+            assert all(future.result() for future in futures)
+            pooled = len(futures) / (time.perf_counter() - started)
+        finally:
+            auth.shutdown()
+        print(f"cost={rounds}: {single:7.1f} verifies/s on one core, "
+              f"{pooled:7.1f} verifies/s with {auth.workers} workers")
+        report(f"verify (cost {rounds})", latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="timed executions per query")
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows after the run")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    geo = sub.add_parser("geo", help=bench_geo.__doc__)
+    geo.add_argument("--rows", type=int, default=100000, help="listings to seed (0 to reuse existing data)")
+    geo.set_defaults(func=bench_geo)
+
+    search = sub.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--rows", type=int, default=1000000, help="listings to seed (0 to reuse existing data)")
+    search.add_argument("--target-ms", type=float, default=50, help="p95 latency target")
+    search.set_defaults(func=bench_search)
+
+    reviews = sub.add_parser("reviews-media", help=bench_reviews_media.__doc__)
+    reviews.add_argument("--listings", type=int, default=50, help="reviewed listings to seed")
+    reviews.add_argument("--media", type=int, default=2000, help="media rows per listing")
+    reviews.add_argument("--legacy-repeat", type=int, default=3, help="timed runs of the slow legacy query")
+    reviews.set_defaults(func=bench_reviews_media)
+
+    notify = sub.add_parser("chat-notify", help=bench_chat_notify.__doc__)
+    notify.add_argument("--messages", type=int, default=500, help="messages to send through the trigger")
+    notify.set_defaults(func=bench_chat_notify)
+
+    conversations = sub.add_parser("conversations", help=bench_conversations.__doc__)
+    conversations.add_argument("--conversations", type=int, default=20000, help="threads for the heavy user")
+    conversations.set_defaults(func=bench_conversations)
+
+    race = sub.add_parser("conversation-race", help=bench_conversation_race.__doc__)
+    race.add_argument("--threads", type=int, default=32, help="concurrent sessions per round")
+    race.add_argument("--rounds", type=int, default=20, help="fresh conversation races to run")
+    race.set_defaults(func=bench_conversation_race)
+
+    login = sub.add_parser("login", help=bench_login.__doc__)
+    login.set_defaults(func=bench_login)
+
+    listing_cache = sub.add_parser("listing-cache", help=bench_listing_cache.__doc__)
+    listing_cache.add_argument("--listings", type=int, default=500, help="listings to seed")
+    listing_cache.add_argument("--media", type=int, default=12, help="media rows per listing")
+    listing_cache.add_argument("--entries", type=int, default=128, help="cache capacity")
+    listing_cache.set_defaults(func=bench_listing_cache)
+
+    overview = sub.add_parser("async-overview", help=bench_async_overview.__doc__)
+    overview.add_argument("--listings", type=int, default=200, help="listings owned by the agency")
+    overview.set_defaults(func=bench_async_overview)
+
+    dashboard = sub.add_parser("dashboard", help=bench_dashboard.__doc__)
+    dashboard.add_argument("--listings", type=int, default=200, help="listings owned by the agency")
+    dashboard.set_defaults(func=bench_dashboard)
+
+    prepared = sub.add_parser("prepared", help=bench_prepared.__doc__)
+    prepared.add_argument("--listings", type=int, default=1000, help="listings to seed")
+    prepared.set_defaults(func=bench_prepared)
+
+    auth = sub.add_parser("auth", help=bench_auth.__doc__)
+    auth.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12], help="bcrypt work factors to compare")
+    auth.add_argument("--logins", type=int, default=20, help="sequential verifications per cost")
+    auth.add_argument("--workers", type=int, help="auth pool size (default: AUTH_WORKERS)")
+    auth.set_defaults(func=bench_auth)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        db_pool.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+import select
+import threading
+
+import psycopg2
+import db_pool
+
+
+def channel_name(conversation_id):
+    """NOTIFY channel the chats trigger publishes a conversation's messages on"""
+    return "chat_" + str(conversation_id).replace("-", "")
+
+
+class ChatListener(threading.Thread):
+    """Background LISTEN on a set of conversations, calling `on_message(payload)` per new chat.
+
+    Uses its own connection rather than one from the pool: LISTEN is session
+    state, and a pooled connection would keep receiving notifications after
+    being handed to someone else.
+    """
+
+    def __init__(self, conversation_ids, on_message, poll_interval=1.0, connect_kwargs=None):
+        super().__init__(daemon=True)
+        self.on_message = on_message
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._conn = psycopg2.connect(**(connect_kwargs or db_pool.connect_kwargs()))
+        self._conn.autocommit = True
+        with self._conn.cursor() as cur:
+            for conversation_id in conversation_ids:
+                cur.execute(f'LISTEN "{channel_name(conversation_id)}"')
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([self._conn], [], [], self.poll_interval)
+                if not readable:
+                    continue
+                self._conn.poll()
+                while self._conn.notifies:
+                    notify = self._conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(notify.payload)
+                    except ValueError:
+                        continue
+                    self.on_message(payload)
+        except (psycopg2.Error, OSError, ValueError) as e:
+            if not self._stop_event.is_set():
+                print(f"\n⚠️Live chat updates stopped: {e}")
+        finally:
+            if not self._conn.closed:
+                self._conn.close()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.join(timeout if timeout is not None else self.poll_interval * 2)
@@ -2,53 +2,142 @@ import psycopg2
 from dotenv import load_dotenv
 import os
 import uuid
+import json
+import db_pool
+import query_registry
+from chat_listener import ChatListener
+from session_store import SessionStore
 
 load_dotenv()
 
+CHAT_PAGE_SIZE = 20
+CHAT_LIST_LIMIT = 50
+
+# Resolve the username and get-or-create the (sorted) participant pair in
+# one round trip; the unique pair constraint arbitrates concurrent starts
+GET_OR_CREATE_CONVERSATION_SQL = """
+    WITH other AS (
+        SELECT id FROM users WHERE username = %s
+    ),
+    pair AS (
+        SELECT LEAST(%s::uuid, id) AS p1, GREATEST(%s::uuid, id) AS p2 FROM other
+    ),
+    created AS (
+        INSERT INTO conversations (id, participant_1, participant_2)
+        SELECT %s, p1, p2 FROM pair
+        ON CONFLICT (participant_1, participant_2) DO NOTHING
+        RETURNING id
+    )
+    SELECT (SELECT id FROM other),
+           COALESCE(
+               (SELECT id FROM created),
+               (SELECT c.id FROM conversations c
+                JOIN pair ON c.participant_1 = pair.p1 AND c.participant_2 = pair.p2)
+           )
+"""
+
+# Membership comes from the user's own inbox rows, so the list is one
+# range scan of idx_conversation_inbox_recent rather than an OR over
+# both participant columns
+def user_chats_query(user_id, limit=CHAT_LIST_LIMIT, after=None):
+    """Most-recent-first page of a user's conversations, optionally after a (last_message_at, conversation_id) key; returns (sql, params)"""
+    query = """
+        SELECT ci.conversation_id, u.username AS contact_name,
+               ci.unread_count, ci.last_preview, ci.last_message_at
+        FROM conversation_inbox ci
+        JOIN users u ON u.id = ci.peer_id
+        WHERE ci.user_id = %s
+    """
+    params = [user_id]
+    if after:
+        last_at, conversation_id = after
+        # Threads with no messages yet sort after everything (NULLS LAST)
+        if last_at is None:
+            query += " AND ci.last_message_at IS NULL AND ci.conversation_id < %s::uuid"
+            params.append(conversation_id)
+        else:
+            query += """ AND (ci.last_message_at IS NULL
+                  OR (ci.last_message_at, ci.conversation_id) < (%s::timestamptz, %s::uuid))"""
+            params.extend(after)
+    query += " ORDER BY ci.last_message_at DESC NULLS LAST, ci.conversation_id DESC LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
+USER_CHATS_SQL = user_chats_query(None)[0]
+
+
+def chat_messages_query(conversation_id, limit=CHAT_PAGE_SIZE, before=None):
+    """Newest-first page of a conversation, optionally before a (created_at, id) key; returns (sql, params)"""
+    query = """
+        SELECT c.id, u.username, c.message, c.created_at
+        FROM chats c
+        JOIN users u ON u.id = c.sender_id
+        WHERE c.conversation_id = %s
+    """
+    params = [conversation_id]
+    if before:
+        query += " AND (c.created_at, c.id) < (%s::timestamptz, %s::uuid)"
+        params.extend(before)
+    query += " ORDER BY c.created_at DESC, c.id DESC LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
+query_registry.register("chat_messages_latest", chat_messages_query(None)[0])
+query_registry.register("chat_messages_before", chat_messages_query(None, before=(None, None))[0])
+
+
 class ChatSystem:
     def __init__(self, conn, current_user_id):
         self.conn = conn
         self.current_user_id = current_user_id
 
-    def list_user_chats(self):
-        """this is a function to load chats of a particular user"""
+    def list_user_chats(self, limit=CHAT_LIST_LIMIT, after=None):
+        """this is a function to load chats of a particular user, most recent first with unread counts;
+        pass the (last_message_at, conversation_id) of the previous page's last row as `after` for the next page"""
+        query, params = user_chats_query(self.current_user_id, limit, after)
         with self.conn.cursor() as cur:
-            cur.execute("""
-                SELECT c.id, u1.username AS contact_name
-                FROM conversations c
-                JOIN users u1 ON (CASE 
-                    WHEN c.participant_1 = %s THEN c.participant_2
-                    ELSE c.participant_1 END) = u1.id
-                WHERE c.participant_1 = %s OR c.participant_2 = %s
-            """, (self.current_user_id, self.current_user_id, self.current_user_id))
-            return cur.fetchall()  # [(conversation_id, contact_name), ...]
+            cur.execute(query, params)
+            return cur.fetchall()  # [(conversation_id, contact_name, unread, preview, last_at), ...]
 
-    def get_or_create_conversation(self, user1_id, user2_username):
-        """this is a function to initialize or get a conversation instance from the database"""
+    def mark_conversation_read(self, conversation_id, user_id):
+        """Mark the other side's messages read and take them off the user's unread counter"""
         with self.conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE username = %s", (user2_username,))
-            row = cur.fetchone()
-            if not row:
-                print("User not found.")
-                return None
-            user2_id = row[0]
-            ids = sorted([user1_id, user2_id])
-
             cur.execute("""
-                SELECT id FROM conversations 
-                WHERE participant_1 = %s AND participant_2 = %s
-            """, (ids[0], ids[1]))
+                WITH marked AS (
+                    UPDATE chats SET read = TRUE
+                    WHERE conversation_id = %s AND sender_id <> %s AND read IS NOT TRUE
+                    RETURNING 1
+                )
+                UPDATE conversation_inbox
+                SET unread_count = GREATEST(unread_count - (SELECT COUNT(*) FROM marked), 0)
+                WHERE conversation_id = %s AND user_id = %s
+                RETURNING (SELECT COUNT(*) FROM marked)
+            """, (conversation_id, user_id, conversation_id, user_id))
             row = cur.fetchone()
-            if row:
-                return row[0]
-
-            conversation_id = str(uuid.uuid4())
-            cur.execute("""
-                INSERT INTO conversations (id, participant_1, participant_2)
-                VALUES (%s, %s, %s)
-            """, (conversation_id, ids[0], ids[1]))
             self.conn.commit()
-            return conversation_id
+            return row[0] if row else 0
+
+    def get_or_create_conversation(self, user1_id, user2_username):
+        """this is a function to initialize or get a conversation instance from the database"""
+        with self.conn.cursor() as cur:
+            # A racing session can commit the same pair after this statement's
+            # snapshot was taken: ON CONFLICT then inserts nothing and the
+            # fallback SELECT can't see the row yet. The retry runs with a new
+            # snapshot that includes it, so one retry is always enough.
+            for _ in range(2):
+                cur.execute(GET_OR_CREATE_CONVERSATION_SQL, (
+                    user2_username, user1_id, user1_id, str(uuid.uuid4())
+                ))
+                user2_id, conversation_id = cur.fetchone()
+                self.conn.commit()
+                if not user2_id:
+                    print("User not found.")
+                    return None
+                if conversation_id:
+                    return conversation_id
+        return None
 
     def send_message(self, conversation_id, sender_id, message, attachments=None):
         """this is the function that sends the message typed in by the user"""
@@ -66,24 +155,108 @@ class ChatSystem:
             ))
             self.conn.commit()
     
-    def get_chat_messages(self, conversation_id):
-        """this is a function to get all chats with all the other people the user has"""
+    def get_chat_messages(self, conversation_id, limit=CHAT_PAGE_SIZE, before=None):
+        """Latest `limit` messages of a conversation (or the page before the (created_at, id) key), oldest first"""
+        _, params = chat_messages_query(conversation_id, limit, before)
+        with self.conn.cursor() as cur:
+            query_registry.execute(cur, "chat_messages_before" if before else "chat_messages_latest", params)
+            chats = cur.fetchall()
+            chats.reverse()
+            return chats
+
+    def get_messages_since(self, conversation_id, last_seen_id):
+        """Only the messages that arrived after `last_seen_id`, oldest first"""
+        if not last_seen_id:
+            return self.get_chat_messages(conversation_id)
         with self.conn.cursor() as cur:
             cur.execute("""
-                SELECT u.username, c.message, c.created_at
+                SELECT c.id, u.username, c.message, c.created_at
                 FROM chats c
                 JOIN users u ON u.id = c.sender_id
                 WHERE c.conversation_id = %s
-                ORDER BY c.created_at ASC
-            """, (conversation_id,))
-            chats = cur.fetchall()
-            return chats
+                  AND (c.created_at, c.id) > (
+                      SELECT created_at, id FROM chats WHERE id = %s
+                  )
+                ORDER BY c.created_at, c.id
+            """, (conversation_id, last_seen_id))
+            return cur.fetchall()
+
+    def _print_messages(self, messages):
+        for _, username, message, created in messages:
+            print(f"[{created}] {username}: {message}")
+
+    def _start_listener(self, conversation_id, state):
+        """Push new messages to the screen as they are committed; None if LISTEN is unavailable"""
+        def on_message(payload):
+            state["last_seen_id"] = payload["id"]
+            suffix = "…" if payload.get("truncated") else ""
+            print(f"\n[{payload['created_at']}] {payload['username']}: {payload['message']}{suffix}")
+
+        try:
+            listener = ChatListener([conversation_id], on_message)
+        except psycopg2.Error as e:
+            print(f"⚠️Live updates unavailable ({e}); use /refresh to check for new messages.")
+            return None
+        listener.start()
+        return listener
+
+    def open_chat(self, conversation_id, contact_name):
+        """Show the latest page of a conversation, then stream new messages live"""
+        messages = self.get_chat_messages(conversation_id)
+        print(f"\n=== Chat with {contact_name} ===")
+        if len(messages) == CHAT_PAGE_SIZE:
+            print("(type /older for earlier messages)")
+        self._print_messages(messages)
+        oldest = (messages[0][3], messages[0][0]) if messages else None
+        state = {"last_seen_id": messages[-1][0] if messages else None}
+
+        self.mark_conversation_read(conversation_id, self.current_user_id)
+        listener = self._start_listener(conversation_id, state)
+        try:
+            while True:
+                print("------------------------------")
+                new_msg = input("Message (/older, /refresh, blank to go back): ").strip()
+                if not new_msg:
+                    break
+                if new_msg == "/older":
+                    if not oldest:
+                        print("No earlier messages.")
+                        continue
+                    older = self.get_chat_messages(conversation_id, before=oldest)
+                    if not older:
+                        print("No earlier messages.")
+                        oldest = None
+                        continue
+                    print("--- earlier messages ---")
+                    self._print_messages(older)
+                    oldest = (older[0][3], older[0][0])
+                    continue
+                if new_msg != "/refresh":
+                    self.send_message(conversation_id, self.current_user_id, new_msg)
+                    if listener and listener.is_alive():
+                        continue
+                newer = self.get_messages_since(conversation_id, state["last_seen_id"])
+                self._print_messages(newer)
+                if newer:
+                    state["last_seen_id"] = newer[-1][0]
+                    if not oldest:
+                        oldest = (newer[0][3], newer[0][0])
+        finally:
+            if listener:
+                listener.stop()
+            self.mark_conversation_read(conversation_id, self.current_user_id)
 
     def cli_interface(self):
         """this is a function to run the user interface"""
+        pages = [None]  # keyset cursor of each page shown so far; pages[-1] is the current one
         while True:
             print("\n=== Your Conversations ===")
-            chats = self.list_user_chats()
+            chats = self.list_user_chats(CHAT_LIST_LIMIT + 1, after=pages[-1])
+            has_more = len(chats) > CHAT_LIST_LIMIT
+            chats = chats[:CHAT_LIST_LIMIT]
+            if not chats and len(pages) > 1:
+                pages.pop()
+                continue
             if not chats:
                 print("No chats found.")
                 print("1. Start New Chat")
@@ -104,9 +277,11 @@ class ChatSystem:
                 else:
                     print("Invalid option.")
             else:
-                for idx, (cid, contact_name) in enumerate(chats, 1):
-                    print(f"{idx}. {contact_name}")
-                choice = input("Open chat (enter number or 'n' for new, 'q' to quit): ").strip()
+                for idx, (cid, contact_name, unread, preview, last_at) in enumerate(chats, 1):
+                    badge = f" ({unread} unread)" if unread else ""
+                    print(f"{idx}. {contact_name}{badge}" + (f" - {preview}" if preview else ""))
+                paging = (", 'm' for older chats" if has_more else "") + (", 'p' for newer" if len(pages) > 1 else "")
+                choice = input(f"Open chat (enter number or 'n' for new{paging}, 'q' to quit): ").strip()
                 if choice.lower() == 'n':
                     name = input("Recipient username: ").strip()
                     conversation_id = self.get_or_create_conversation(self.current_user_id, name)
@@ -114,18 +289,16 @@ class ChatSystem:
                         message = input("Message: ").strip()
                         attachments = input("Attachments (optional): ").strip()
                         self.send_message(conversation_id, self.current_user_id, message, attachments or None)
+                        pages = [None]
+                elif choice.lower() == 'm' and has_more:
+                    pages.append((chats[-1][4], chats[-1][0]))
+                elif choice.lower() == 'p' and len(pages) > 1:
+                    pages.pop()
                 elif choice.lower() == 'q':
                     break
                 elif choice.isdigit() and 1 <= int(choice) <= len(chats):
                     selected_chat = chats[int(choice) - 1]
-                    messages = self.get_chat_messages(selected_chat[0])
-                    print(f"\n=== Chat with {selected_chat[1]} ===")
-                    for username, message, created in messages:
-                        print(f"[{created}] {username}: {message}")
-                    print("------------------------------")
-                    new_msg = input("Send a new message (leave blank to go back): ").strip()
-                    if new_msg:
-                        self.send_message(selected_chat[0], self.current_user_id, new_msg)
+                    self.open_chat(selected_chat[0], selected_chat[1])
                 else:
                     print("Invalid selection.")
     
@@ -134,22 +307,26 @@ class ChatSystem:
         self.cli_interface()
 
 if __name__ == "__main__":
+    sessions = SessionStore()
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        print("Connected to database successfully.")
-        current_user_id = input("Enter your user ID: ").strip()
-        try:
-            uuid.UUID(current_user_id)
-        except ValueError:
-            print("Invalid UUID. Please provide a valid user ID.")
-            exit()
+        conn = db_pool.getconn()
+        session = sessions.resume(conn)
     except psycopg2.Error as e:
-        print(f"Database connection failed: {e}")    
+        print(f"Database connection failed: {e}")
+        exit()
+    if not session:
+        db_pool.putconn(conn)
+        db_pool.close_pool()
+        if not sessions.enabled:
+            print("Set SESSION_SECRET in .env, then log in once with: python cli_app.py")
+        else:
+            print("No saved session. Log in first with: python cli_app.py")
+        exit()
+    current_user_id, username = session
+    print(f"Signed in as {username}.")
     app = ChatSystem(conn, current_user_id)
-    app.run()        
\ No newline at end of file
+    try:
+        app.run()
+    finally:
+        db_pool.putconn(conn)
+        db_pool.close_pool()
@@ -1,40 +1,101 @@
 
+import argparse
 import psycopg2
-import bcrypt
 import getpass
 from datetime import datetime
-import os
 import uuid
 from dotenv import load_dotenv
 import random
 import string
 import json
-from Real_estate import ListingManager
+from Real_estate import ListingManager, MEDIA_TYPES
 from explorer import Explorer
-
-
+from dashboard import AgencyDashboard
+from listing_search import search_listings
+import db_pool
+import query_registry
+import query_stats
+from listing_cache import cache_stats
+from auth import get_auth_service
+from async_db import close_sync_repository, get_sync_repository
+from session_store import SessionStore
+
+LISTINGS_PAGE_SIZE = 20
+
+# Profile columns (username .. last_active) followed by the agency row
+USER_CONTEXT_SQL = """
+    SELECT u.username, u.email, u.phone, u.password_hash, u.is_agent,
+           u.created_at, u.last_active,
+           a.name, a.license_number, a.bio, a.verified,
+           a.profile_image_url, a.created_at, a.id AS agency_id
+    FROM users u
+    LEFT JOIN agencies a ON a.user_id = u.id
+    WHERE u.id = %s
+    ORDER BY a.created_at
+    LIMIT 1
+"""
+
+# Tail of RESUME_SQL: stamps last_active and returns the id, the previous
+# last_active and then the USER_CONTEXT_SQL columns, so resuming a session
+# is a single round trip
+_SESSION_COLUMNS = """
+        RETURNING u.id, prev.last_active AS previous_active, u.username, u.email,
+                  u.phone, u.password_hash, u.is_agent, u.created_at, u.last_active
+    )
+    SELECT t.id, t.previous_active, t.username, t.email, t.phone, t.password_hash,
+           t.is_agent, t.created_at, t.last_active,
+           a.name, a.license_number, a.bio, a.verified,
+           a.profile_image_url, a.created_at, a.id AS agency_id
+    FROM touched t
+    LEFT JOIN agencies a ON a.user_id = t.id
+    ORDER BY a.created_at
+    LIMIT 1
+"""
+
+# Same row shape as RESUME_SQL, but read-only: nothing is written until the
+# password has been verified (see SessionStore.create)
+LOGIN_SQL = """
+    SELECT u.id, u.last_active AS previous_active, u.username, u.email,
+           u.phone, u.password_hash, u.is_agent, u.created_at, u.last_active,
+           a.name, a.license_number, a.bio, a.verified,
+           a.profile_image_url, a.created_at, a.id AS agency_id
+    FROM users u
+    LEFT JOIN agencies a ON a.user_id = u.id
+    WHERE u.username = %s
+    ORDER BY a.created_at
+    LIMIT 1
+"""
+
+# Same row as LOGIN_SQL, looked up by a saved session's token hash
+RESUME_SQL = """
+    WITH session AS (
+        UPDATE sessions SET last_used_at = NOW()
+        WHERE token_hash = %s AND expires_at > NOW()
+        RETURNING user_id
+    ),
+    touched AS (
+        UPDATE users u SET last_active = NOW()
+        FROM users prev, session s
+        WHERE prev.id = u.id AND u.id = s.user_id
+""" + _SESSION_COLUMNS
+
+query_registry.register("user_context", USER_CONTEXT_SQL)
+query_registry.register("login", LOGIN_SQL)
+query_registry.register("resume_session", RESUME_SQL)
 
 
 class RealEstateCLI:
     def __init__(self):
-        """Initialize database connection"""
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            sslmode="require"
-        )
+        """Borrow a database connection from the shared pool"""
+        self.conn = db_pool.getconn()
         self.current_user = None
         self.current_user_id = None
         self.is_agent = False
+        self.user_context = None
+        self.auth = get_auth_service()
+        self.sessions = SessionStore()
         
 
-    def _hash_password(self, password):
-        """Securely hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode(), salt).decode()
-
     def _check_username_exists(self, username):
         """Check if username already exists in database"""
         with self.conn.cursor() as cur:
@@ -48,18 +109,48 @@ class RealEstateCLI:
             return cur.fetchone() is not None
 
     def _verify_credentials(self, username, password):
-        """Verify username and password against database"""
-        with self.conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, password_hash, is_agent FROM users WHERE username = %s", 
-                (username,)
+        """Verify username and password, returning the session context.
+
+        One read-only query loads the hash together with the profile and
+        agency; nothing is written for a wrong password. The caller records
+        the login (last_active and the saved session) with SessionStore.create,
+        so a login is two round trips: the write can only go out once bcrypt
+        has accepted the password.
+        """
+        # Autocommit so no transaction stays open while bcrypt runs
+        self.conn.commit()
+        self.conn.autocommit = True
+        try:
+            with self.conn.cursor() as cur:
+                query_registry.execute(cur, "login", (username,))
+                row = cur.fetchone()
+                columns = [col.name for col in cur.description]
+        finally:
+            self.conn.autocommit = False
+        if not row:
+            return None
+        user_id, stored_hash = row[0], row[5]
+        if not self.auth.verify(password, stored_hash):
+            return None
+
+        if self.auth.needs_rehash(stored_hash):
+            self.auth.rehash_async(
+                password, lambda new_hash: self._store_upgraded_hash(user_id, stored_hash, new_hash)
             )
-            result = cur.fetchone()
-            if result:
-                user_id, stored_hash, is_agent = result
-                if bcrypt.checkpw(password.encode(), stored_hash.encode()):
-                    return user_id, is_agent
-        return None, False
+        return self._session_from_row(row, columns)
+
+    def _store_upgraded_hash(self, user_id, old_hash, new_hash):
+        """Replace a hash made at an older cost (runs on the auth pool, with its own connection)"""
+        try:
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                        (new_hash, user_id, old_hash)
+                    )
+                conn.commit()
+        except psycopg2.Error as e:
+            print(f"\n⚠️Could not upgrade password hash: {e}")
 
     def _generate_license_number(self, state_code="CA"):
         """Generate unique license number"""
@@ -86,7 +177,9 @@ class RealEstateCLI:
             if password == confirm:
                 break
             print("\nError: ⚠️Passwords don't match!")
-        
+
+        # Hash in the background while the remaining question is answered
+        password_hash = self.auth.hash_password_async(password)
         is_agent = input("Are you registering as an agent? (y/n): ").lower() == 'y'
         
         try:
@@ -102,7 +195,7 @@ class RealEstateCLI:
                     """,
                     (
                         user_id, username, email, phone,
-                        self._hash_password(password), is_agent, datetime.utcnow()
+                        password_hash.result(), is_agent, datetime.utcnow()
                     )
                 )
                 self.conn.commit()
@@ -110,6 +203,9 @@ class RealEstateCLI:
                 self.current_user = username
                 self.current_user_id = user_id
                 self.is_agent = is_agent
+                self.invalidate_user_context()
+                self.get_user_context()
+                self.sessions.create(self.conn, user_id)
                 return True
         except psycopg2.Error as e:
             self.conn.rollback()
@@ -123,17 +219,55 @@ class RealEstateCLI:
         username = input("👤Username: ").strip()
         password = getpass.getpass("🔒Password: ")
         
-        user_id, is_agent = self._verify_credentials(username, password)
-        if user_id:
-            print(f"\nWelcome back, {username}!")
-            self.current_user = username
-            self.current_user_id = user_id
-            self.is_agent = is_agent
+        try:
+            context = self._verify_credentials(username, password)
+        except psycopg2.Error as e:
+            print(f"\n❌Database Error: {e}")
+            return False
+        if context:
+            last_active = self.sessions.create(self.conn, context["id"])
+            if last_active:
+                context["user"] = context["user"][:6] + (last_active,)
+            self._start_session(context)
             return True
         else:
             print("\n⚠️Invalid username or password")
             return False
 
+    def _start_session(self, context):
+        """Make the user described by a LOGIN_SQL/RESUME_SQL context the current user"""
+        username = context["user"][0]
+        print(f"\nWelcome back, {username}!")
+        if context["previous_active"]:
+            print(f"Last seen {context['previous_active'].strftime('%Y-%m-%d %H:%M')}")
+        self.current_user = username
+        self.current_user_id = context["id"]
+        self.is_agent = context["is_agent"]
+        self.user_context = context
+
+    def resume_session(self):
+        """Pick up a saved login without a password prompt (one query)"""
+        hashed = self.sessions.load()
+        if not hashed:
+            return False
+        self.conn.commit()
+        self.conn.autocommit = True
+        try:
+            with self.conn.cursor() as cur:
+                query_registry.execute(cur, "resume_session", (hashed,))
+                row = cur.fetchone()
+                columns = [col.name for col in cur.description]
+        except psycopg2.Error as e:
+            print(f"\n⚠️Could not resume the saved session: {e}")
+            return False
+        finally:
+            self.conn.autocommit = False
+        if not row:
+            self.sessions.forget()
+            return False
+        self._start_session(self._session_from_row(row, columns))
+        return True
+
     def register_agency(self):
         """Register a new agency"""
         if not self.current_user_id:
@@ -167,6 +301,7 @@ class RealEstateCLI:
                     )
                 )
                 self.conn.commit()
+                self.invalidate_user_context()
                 print("\n✅Agency registered successfully!")
                 return True
         except psycopg2.Error as e:
@@ -174,16 +309,50 @@ class RealEstateCLI:
             print(f"\n ❌Database Error: {e}")
             return False
 
+    def _load_user_context(self):
+        """Fetch the profile and agency used by the menus in one query"""
+        with self.conn.cursor() as cur:
+            query_registry.execute(cur, "user_context", (self.current_user_id,))
+            row = cur.fetchone()
+            columns = [col.name for col in cur.description]
+        if not row:
+            return None
+        return self._context_from_row(row, columns)
+
+    @staticmethod
+    def _context_from_row(row, columns):
+        """Split a USER_CONTEXT_SQL row; `columns` are its cursor.description names"""
+        return {
+            "user": row[:7],
+            "is_agent": row[4],
+            "agency": row[7:] if row[7] is not None else None,
+            "agency_id": row[columns.index("agency_id")],
+        }
+
+    @classmethod
+    def _session_from_row(cls, row, columns):
+        """Context from a LOGIN_SQL/RESUME_SQL row, plus the user id and previous last_active"""
+        context = cls._context_from_row(row[2:], columns[2:])
+        context["id"] = row[0]
+        context["previous_active"] = row[1]
+        return context
+
+    def get_user_context(self):
+        """Session cache of the logged-in user's profile and agency membership"""
+        if not self.current_user_id:
+            return None
+        if self.user_context is None:
+            self.user_context = self._load_user_context()
+        return self.user_context
+
+    def invalidate_user_context(self):
+        """Drop the cached profile so the next read goes back to the database"""
+        self.user_context = None
+
     def has_agency(self):
         """Check if user has an agency"""
-        if not self.current_user_id:
-            return False
-        with self.conn.cursor() as cur:
-            cur.execute(
-                "SELECT 1 FROM agencies WHERE user_id = %s", 
-                (self.current_user_id,)
-            )
-            return cur.fetchone() is not None
+        context = self.get_user_context()
+        return bool(context and context["agency"])
 
     def home_menu(self):
         """Display home menu after login/registration"""
@@ -212,72 +381,111 @@ class RealEstateCLI:
                 self.save_listings_to_Explorer()
 
             elif choice == "3":
-                try:
-                    from feedbck_system import FeedbackSystem
-                    feedback_cli = FeedbackSystem(self.current_user_id)
-                    feedback_cli.review_menu()
-                except Exception as e:
-                    print(f"⚠️Failed to launch feedback system: {e}")
+                self.open_reviews()
             elif choice == "4":
                 explorer = Explorer()
-                explorer.get_properties(self.current_user_id)
-                explorer.menu(self.current_user_id)  
+                try:
+                    explorer.get_properties(self.current_user_id)
+                    explorer.menu(self.current_user_id)
+                finally:
+                    explorer.close()
             elif choice == "5":
                 self.display_user_details()    
             elif choice == "6":
                 confirm = input("Are you sure you want to logout? (y/n): ").lower()
                 if confirm == 'y':
+                    self.sessions.revoke(self.conn)
                     self.current_user = None
                     self.current_user_id = None
                     self.is_agent = False
+                    self.invalidate_user_context()
                     break
             else:
                 print("⚠️Invalid option. Please try again.")
 
 
-    def get_all_listings(self):
+    def _iter_active_listings_page(self, after=None, page_size=LISTINGS_PAGE_SIZE):
+        """Stream one page of active listings (newest first) seeking past the (created_at, id) key"""
+        query = """
+            SELECT id, title, price, property_type, status, created_at
+            FROM listings
+            WHERE status = 'active'
+        """
+        params = []
+        if after:
+            query += " AND (created_at, id) < (%s::timestamptz, %s::uuid)"
+            params.extend(after)
+        query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(page_size)
+
+        with self.conn.cursor(name=f"active_listings_{uuid.uuid4().hex}") as cur:
+            cur.itersize = page_size
+            cur.execute(query, params)
+            for row in cur:
+                yield row
+        self.conn.commit()
+
+    def get_all_listings(self, page_size=LISTINGS_PAGE_SIZE):
+        """Browse active listings one page at a time"""
+        after = None
+        shown = 0
         try:
-            with self.conn.cursor() as cur:
-                cur.execute("""
-                SELECT id, title, price, property_type, status
-                FROM listings
-                WHERE status = 'active'
-                """)
-                listings = cur.fetchall()
-
-                if listings:
-                    print("\n=== 🟢 Active Listings ===")
-                    for l in listings:
-                        print("\n" + "=" * 50)
-                        print(f"🆔 ID       : {l[0]}")
-                        print(f"🏷️  Title    : {l[1]}")
-                        print(f"💰 Price    : ${l[2]:,.2f}")
-                        print(f"🏘️  Type     : {l[3]}")
-                        print(f"📦 Status   : {l[4]}")
-                        print("=" * 50)
-                else:
+            while True:
+                count = 0
+                for l in self._iter_active_listings_page(after, page_size):
+                    if shown == 0 and count == 0:
+                        print("\n=== 🟢 Active Listings ===")
+                    print("\n" + "=" * 50)
+                    print(f"🆔 ID       : {l[0]}")
+                    print(f"🏷️  Title    : {l[1]}")
+                    print(f"💰 Price    : ${l[2]:,.2f}")
+                    print(f"🏘️  Type     : {l[3]}")
+                    print(f"📦 Status   : {l[4]}")
+                    print("=" * 50)
+                    after = (l[5], l[0])
+                    count += 1
+                shown += count
+
+                if shown == 0:
                     print("\n⚠️  No active listings available.")
-            
-            return listings
+                    break
+                if count < page_size:
+                    print(f"\n— End of listings ({shown} shown) —")
+                    break
+                more = input("\nPress enter for more listings or 'q' to stop: ").strip().lower()
+                if more == 'q':
+                    break
+
+            return shown
 
         except psycopg2.Error as e:
+            self.conn.rollback()
             print(f"\n❌ Database Error: {e}")
-            return []
+            return shown
 
     def save_listings_to_Explorer(self):
-        title = input("Enter title of listing to save it for further exploration: ").strip() or None
-        if not title:
-            print("⚠️Listing title is required.")
+        query = input("Search listings to save for further exploration (title, description or address): ").strip() or None
+        if not query:
+            print("⚠️Search text is required.")
             return
         try:
             with self.conn.cursor() as cur:
-                cur.execute("SELECT id FROM listings WHERE title = %s", (title,))
-                result = cur.fetchone()
-                if not result:
+                results = search_listings(query, limit=10, conn=self.conn)
+                if not results:
                     print("Listing not found.")
                     return
 
-                listing_id = result[0]
+                print("\n=== 🔎 Matching Listings ===")
+                for i, l in enumerate(results, 1):
+                    print(f"{i}. {l['title']} | {l['property_type']} | {l['status']} (ID: {l['id']})")
+                selection = input("Select listing to save (0 to cancel): ").strip()
+                if not selection.isdigit() or not 0 <= int(selection) <= len(results):
+                    print("⚠️Invalid selection.")
+                    return
+                if selection == "0":
+                    return
+
+                listing_id = results[int(selection) - 1]['id']
                 
                 notes = input("Add any notes (optional): ").strip() or None
                 
@@ -301,21 +509,24 @@ class RealEstateCLI:
             
     def agency_menu(self):
         """Display agency menu"""
+        # The dashboard is one heavy query, so it is shown once per visit rather than after every action
+        print("\n" + "=" * 40)
+        print("🏢  AGENCY DASHBOARD")
+        print("=" * 40)
+        AgencyDashboard(self.conn, self.get_user_context()["agency_id"]).show()
         while True:
-            print("\n" + "=" * 40)
-            print("🏢  AGENCY DASHBOARD")
-            print("=" * 40)
-
+            print("-" * 40)
             print("1. 📝 Make New Listing")
             print("2. 📂 View Existing Listings")
             print("3. 💬 Open Chat")
             print("4. 🗒️  Open Reviews")
             print("5. 🧾 View Agency Details")
-            print("6. 🔙 Back to Home")
+            print("6. 🖼️  Attach Media to Listing")
+            print("7. 🔙 Back to Home")
 
             choice = input("Select option: ").strip()
         
-            if choice == "6":
+            if choice == "7":
                 break
             elif choice == "1":
                 print("\n=== create listing ===")
@@ -368,24 +579,27 @@ class RealEstateCLI:
                 confirm = input("Create this listing? (y/n): ").lower()
                 if confirm == 'y':
                     Listing_manager = ListingManager()
-                    listing_id = Listing_manager.create_listing(
-                    user_id=self.current_user_id,  
-
-                    title=title,
-                    description=description,
-                    price=price,
-                    property_type=property_type,
-                    bedrooms=bedrooms,
-                    bathrooms=bathrooms,
-                    square_feet=square_feet,
-                    address=address,
-                    location=location
-                )
-                if listing_id:
-                    print("✅Listing created successfully!")
-                    Listing_manager.fetch_user_listings(self.current_user_id)
-                else:
-                    print("⚠️Listing creation failed")
+                    try:
+                        listing_id = Listing_manager.create_listing(
+                        user_id=self.current_user_id,  
+
+                        title=title,
+                        description=description,
+                        price=price,
+                        property_type=property_type,
+                        bedrooms=bedrooms,
+                        bathrooms=bathrooms,
+                        square_feet=square_feet,
+                        address=address,
+                        location=location
+                    )
+                        if listing_id:
+                            print("✅Listing created successfully!")
+                            Listing_manager.fetch_user_listings(self.current_user_id)
+                        else:
+                            print("⚠️Listing creation failed")
+                    finally:
+                        Listing_manager.close()
 
       
 
@@ -393,54 +607,102 @@ class RealEstateCLI:
                 self.display_agency_listings()
             elif choice == "3":
                 try:
-                    from chatsystem import ChatSystem  
-                    chat_app = ChatSystem(self.conn, self.current_user_id)
-                    chat_app.cli_interface()  
+                    from messages import AgencyInbox
+                    inbox = AgencyInbox(self.conn, self.get_user_context()["agency_id"])
+                    inbox.menu(self.current_user_id)
                 except Exception as e:
                     print(f"⚠️Failed to launch chat system: {e}")
             elif choice == "4":
-                try:
-                    from feedbck_system import FeedbackSystem
-                    feedback_cli = FeedbackSystem(self.current_user_id)
-                    feedback_cli.review_menu()
-                except Exception as e:
-                    print(f"⚠️Failed to launch feedback system: {e}")
+                self.open_reviews()
             elif choice == "5":
                 self.display_agency_details()
+            elif choice == "6":
+                self.attach_media_to_listing()
             else:
                 print("⚠️Invalid option. Please try again.")
 
 
+    def attach_media_to_listing(self):
+        """Collect media for one of the agent's listings and attach it in one batch"""
+        print("\n=== Attach Media to Listing ===")
+        listing_id = input("Listing ID: ").strip()
+        if not listing_id:
+            print("⚠️Listing ID is required.")
+            return
+
+        media = []
+        while True:
+            url = input("Media URL (or press enter to finish): ").strip()
+            if not url:
+                break
+            media_type = input(f"Media type {MEDIA_TYPES} [image]: ").strip().lower() or "image"
+            if media_type not in MEDIA_TYPES:
+                print("⚠️Invalid media type")
+                continue
+            caption = input("Caption (optional): ").strip() or None
+            media.append((url, media_type, caption))
+
+        if not media:
+            print("⚠️No media entered.")
+            return
+
+        listing_manager = ListingManager()
+        try:
+            written = listing_manager.attach_media(self.current_user_id, listing_id, media)
+        finally:
+            listing_manager.close()
+        if written:
+            print(f"✅Attached {written} media item(s) to the listing.")
+        else:
+            print("⚠️No media attached - check the listing ID belongs to you.")
+
+    def open_reviews(self):
+        """Launch the review menu on a pooled connection"""
+        try:
+            from feedbck_system import FeedbackSystem
+            feedback_cli = FeedbackSystem(self.current_user_id)
+        except Exception as e:
+            print(f"⚠️Failed to launch feedback system: {e}")
+            return
+        try:
+            feedback_cli.review_menu()
+        finally:
+            feedback_cli.close()
+
     def display_agency_details(self):
         print("\n" + "=" * 40)
         print("🏢  MY AGENCY DETAILS")
         print("=" * 40)
+        context = self.get_user_context()
+        if not context or not context["agency"]:
+            print("⚠️  No agency details found.")
+            return
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(
-                """
-                SELECT name, license_number, bio, verified, profile_image_url, created_at
-                FROM agencies
-                WHERE user_id = %s
-                """,
-                (self.current_user_id,)
-                )
-                result = cur.fetchone()
-                if result:
-                    fields = [
-                    ("🏷️  Name", result[0]),
-                    ("🆔 License Number", result[1]),
-                    ("📝 Bio", result[2]),
-                    ("✅ Verified", "Yes" if result[3] else "No"),
-                    ("🖼️  Profile Image URL", result[4] or "N/A"),
-                    ("📅 Created At", result[5].strftime("%Y-%m-%d %H:%M:%S"))
-                    ]
-                    for label, value in fields:
-                        print(f"{label}: {value}")
-                else:
-                    print("⚠️  No agency details found.")
+            # Profile and listings are independent, so fetch them side by side
+            overview = get_sync_repository().agency_overview(context["agency_id"], self.current_user_id)
         except psycopg2.Error as e:
             print(f"❌ Database error: {e}")
+            return
+        result = overview["agency"]
+        if not result:
+            print("⚠️  No agency details found.")
+            return
+        fields = [
+        ("🏷️  Name", result["name"]),
+        ("🆔 License Number", result["license_number"]),
+        ("📝 Bio", result["bio"]),
+        ("✅ Verified", "Yes" if result["verified"] else "No"),
+        ("🖼️  Profile Image URL", result["profile_image_url"] or "N/A"),
+        ("📅 Created At", result["created_at"].strftime("%Y-%m-%d %H:%M:%S"))
+        ]
+        for label, value in fields:
+            print(f"{label}: {value}")
+
+        listings = overview["listings"]
+        print(f"\n📂 Listings ({len(listings)})")
+        for listing in listings:
+            price = f"${listing['price']:,.2f}" if listing["price"] is not None else "N/A"
+            print(f"- {listing['title']} | {price} | {listing['property_type']} | {listing['status']}")
 
 
     def display_user_details(self):
@@ -448,32 +710,24 @@ class RealEstateCLI:
         print("👤  USER DETAILS")
         print("=" * 40)
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(
-                """
-                SELECT username, email, phone, password_hash, is_agent, created_at, last_active
-                FROM users
-                WHERE id = %s
-                """,
-                (self.current_user_id,)
-                )
-                result = cur.fetchone()
-                if result:
-                    fields = [
-                    ("👤 Username", result[0]),
-                    ("📧 Email", result[1]),
-                    ("📞 Phone", result[2] or "N/A"),
-
-                    ("🔒 Password Hash","[hidden]" + (result[3][:10] + "..." if result[3] else "N/A")),
-
-                    ("🧑‍💼 Is Agent", "Yes" if result[4] else "No"),
-                    ("📅 Created At", result[5].strftime("%Y-%m-%d %H:%M:%S")),
-                    ("⏰ Last Active", result[6].strftime("%Y-%m-%d %H:%M:%S"))]
-                    
-                    for label, value in fields:
-                        print(f"{label}: {value}")
-                else:
-                    print("⚠️  No user details found!")
+            context = self.get_user_context()
+            result = context["user"] if context else None
+            if result:
+                fields = [
+                ("👤 Username", result[0]),
+                ("📧 Email", result[1]),
+                ("📞 Phone", result[2] or "N/A"),
+
+                ("🔒 Password Hash","[hidden]" + (result[3][:10] + "..." if result[3] else "N/A")),
+
+                ("🧑‍💼 Is Agent", "Yes" if result[4] else "No"),
+                ("📅 Created At", result[5].strftime("%Y-%m-%d %H:%M:%S")),
+                ("⏰ Last Active", result[6].strftime("%Y-%m-%d %H:%M:%S"))]
+                
+                for label, value in fields:
+                    print(f"{label}: {value}")
+            else:
+                print("⚠️  No user details found!")
         except psycopg2.Error as e:
             print(f"❌ Database error: {e}")
 
@@ -548,6 +802,8 @@ class RealEstateCLI:
 
     def run(self):
         """Main application loop"""
+        if self.resume_session():
+            self.home_menu()
         while True:
             print("\n=== MAIN MENU ===")
             print("1. Create New Account")
@@ -567,7 +823,10 @@ class RealEstateCLI:
             else:
                 print("Invalid option. Please try again.")
         
-        self.conn.close()
+        self.auth.shutdown()
+        close_sync_repository()
+        db_pool.putconn(self.conn)
+        db_pool.close_pool()
         print("\nGoodbye!")
     
 
@@ -582,6 +841,22 @@ class RealEstateCLI:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real estate management CLI")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every query and print a per-call-site summary on exit")
+    parser.add_argument("--slow-ms", type=float,
+                        help="log queries slower than this, with their plans, to DB_SLOW_QUERY_LOG (default 500)")
+    args = parser.parse_args()
+    if args.profile:
+        query_stats.configure(enabled=True, slow_ms=args.slow_ms)
+
     app = RealEstateCLI()
-    app.run()
+    try:
+        app.run()
+    finally:
+        if query_stats.enabled():
+            query_stats.print_report()
+            cache = cache_stats()
+            print(f"\nlisting cache: {cache['hits']} hits, {cache['misses']} misses "
+                  f"({cache['hit_rate']:.0%}), {cache['entries']} entries")
 
@@ -0,0 +1,124 @@
+import psycopg2
+import db_pool
+
+DASHBOARD_LISTINGS = 5
+DASHBOARD_REVIEWS = 3
+
+# Every panel of the agency dashboard as one JSON document, so the whole
+# screen is a single round trip: profile, listing counts by status, the
+# best-reviewed listings with their average rating (from
+# listing_rating_stats), unread chat totals and the latest reviews
+AGENCY_DASHBOARD_SQL = """
+    WITH agency AS (
+        SELECT id, user_id, name, license_number, verified, created_at
+        FROM agencies
+        WHERE id = %s
+    ),
+    owned AS (
+        SELECT l.id, l.title, l.status, l.price,
+               COALESCE(rs.review_count, 0) AS review_count,
+               ROUND(rs.rating_sum::numeric / NULLIF(rs.review_count, 0), 1) AS average_rating
+        FROM agency a
+        JOIN listings l ON l.user_id = a.user_id
+        LEFT JOIN listing_rating_stats rs ON rs.listing_id = l.id
+    ),
+    by_status AS (
+        SELECT COALESCE(json_object_agg(status, n), '{}'::json) AS counts
+        -- status is nullable and json_object_agg rejects NULL keys
+        FROM (SELECT COALESCE(status, 'unknown') AS status, COUNT(*) AS n FROM owned GROUP BY 1) s
+    ),
+    top_listings AS (
+        SELECT COALESCE(json_agg(t ORDER BY t.review_count DESC, t.title), '[]'::json) AS listings
+        FROM (
+            SELECT id, title, status, price, review_count, average_rating
+            FROM owned
+            ORDER BY review_count DESC, title
+            LIMIT %s
+        ) t
+    ),
+    unread AS (
+        SELECT COALESCE(SUM(ci.unread_count), 0) AS messages,
+               COUNT(*) FILTER (WHERE ci.unread_count > 0) AS threads
+        FROM agency a
+        JOIN conversation_inbox ci ON ci.user_id = a.user_id
+    ),
+    recent_reviews AS (
+        SELECT COALESCE(json_agg(r ORDER BY r.created_at DESC), '[]'::json) AS reviews
+        FROM (
+            SELECT r.id, o.title, u.username, r.rating, r.comment, r.created_at
+            FROM owned o
+            JOIN reviews r ON r.listing_id = o.id
+            JOIN users u ON u.id = r.reviewer_id
+            ORDER BY r.created_at DESC
+            LIMIT %s
+        ) r
+    )
+    SELECT json_build_object(
+        'agency', row_to_json(agency),
+        'listing_total', (SELECT COUNT(*) FROM owned),
+        'listings_by_status', by_status.counts,
+        'top_listings', top_listings.listings,
+        'unread_messages', unread.messages,
+        'unread_threads', unread.threads,
+        'recent_reviews', recent_reviews.reviews
+    )
+    FROM agency, by_status, top_listings, unread, recent_reviews
+"""
+
+
+class AgencyDashboard:
+    """Summary panels for an agency, loaded with one query"""
+
+    def __init__(self, conn, agency_id):
+        self.conn = conn
+        self.agency_id = agency_id
+
+    def load(self, listings=DASHBOARD_LISTINGS, reviews=DASHBOARD_REVIEWS):
+        """Dashboard as a dict, or None if the agency does not exist"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(AGENCY_DASHBOARD_SQL, (self.agency_id, listings, reviews))
+                row = cur.fetchone()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"❌Database Error: {e}")
+            return None
+        return row[0] if row else None
+
+    def show(self):
+        dashboard = self.load()
+        if not dashboard:
+            print("⚠️  No agency details found.")
+            return dashboard
+
+        agency = dashboard["agency"]
+        verified = "✅ verified" if agency["verified"] else "not verified"
+        print(f"🏷️  {agency['name']} ({verified})")
+
+        counts = dashboard["listings_by_status"]
+        breakdown = ", ".join(f"{status} {n}" for status, n in sorted(counts.items())) or "none yet"
+        print(f"📂 {dashboard['listing_total']} listings: {breakdown}")
+        print(f"💬 {dashboard['unread_messages']} unread messages in {dashboard['unread_threads']} chats")
+
+        if dashboard["top_listings"]:
+            print("\n⭐ Ratings")
+            for listing in dashboard["top_listings"]:
+                rating = f"{listing['average_rating']}/5" if listing["average_rating"] is not None else "no rating"
+                print(f"  {listing['title']} [{listing['status']}] - {rating} ({listing['review_count']} reviews)")
+
+        if dashboard["recent_reviews"]:
+            print("\n🗒️  Latest reviews")
+            for review in dashboard["recent_reviews"]:
+                print(f"  {review['username']} on {review['title']}: {review['rating']}/5 {review['comment'] or ''}")
+        return dashboard
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("usage: python dashboard.py <agency id>")
+        sys.exit(1)
+    with db_pool.connection() as conn:
+        AgencyDashboard(conn, sys.argv[1]).show()
+    db_pool.close_pool()
@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+from dotenv import load_dotenv
+import query_stats
+
+load_dotenv()
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers when it was last returned to the pool
+    and which statements query_registry has PREPAREd on its session"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+        self.prepared = set()
+
+    def cursor(self, *args, **kwargs):
+        """Cursors are instrumented (see query_stats) while profiling is enabled"""
+        if query_stats.enabled():
+            factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs["cursor_factory"] = query_stats.instrumented(factory)
+        return super().cursor(*args, **kwargs)
+
+
+class ConnectionPool:
+    """Thread-safe pool of Postgres connections with health checks and metrics"""
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0, idle_check=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool size must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._connect_kwargs = connect_kwargs
+
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._metrics = {
+            "checkouts": 0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+        for _ in range(minconn):
+            with self._cond:
+                self._size += 1
+            try:
+                self._idle.append(self._open())
+            except psycopg2.Error:
+                with self._cond:
+                    self._size -= 1
+                raise
+
+    def _open(self):
+        """Open a brand new connection (the caller must already own a slot)"""
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._connect_kwargs)
+        with self._cond:
+            self._metrics["connections_opened"] += 1
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection without giving its slot back"""
+        try:
+            if not conn.closed:
+                conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._metrics["connections_closed"] += 1
+
+    def _is_healthy(self, conn):
+        """Cheap liveness check; only pings connections that sat idle for a while"""
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.idle_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        """Check a connection out of the pool, waiting up to `timeout` seconds"""
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolError(f"timed out waiting for a database connection (max {self.maxconn})")
+                self._cond.wait(remaining)
+
+        if conn is not None and not self._is_healthy(conn):
+            with self._cond:
+                self._metrics["health_check_failures"] += 1
+            self._discard(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except psycopg2.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_time_total"] += waited
+            self._metrics["wait_time_max"] = max(self._metrics["wait_time_max"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                close = True
+
+        if close or conn.closed or self._closed:
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a `with` block"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            stats = dict(self._metrics)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+        checkouts = stats["checkouts"]
+        stats["wait_time_avg"] = stats["wait_time_total"] / checkouts if checkouts else 0.0
+        return stats
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_closed_stats = {}
+
+
+def connect_kwargs():
+    """Connection settings from the environment (DATABASE_URL wins over DB_*)"""
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return {"dsn": url}
+    return {
+        "host": os.getenv("DB_HOST"),
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASS"),
+        "port": os.getenv("DB_PORT"),
+        "sslmode": os.getenv("DB_SSLMODE", "require"),
+    }
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    idle_check=float(os.getenv("DB_POOL_IDLE_CHECK", "30")),
+                    **connect_kwargs()
+                )
+    return _pool
+
+
+def getconn(timeout=None):
+    return get_pool().getconn(timeout)
+
+
+def putconn(conn, close=False):
+    get_pool().putconn(conn, close)
+
+
+def connection(timeout=None):
+    return get_pool().connection(timeout)
+
+
+def pool_stats():
+    """Metrics for the shared pool (or the last one closed), or an empty dict if it was never used"""
+    pool = _pool
+    return pool.stats() if pool is not None else dict(_closed_stats)
+
+
+def format_pool_stats(stats):
+    """One-line summary of ConnectionPool.stats() for reports"""
+    return (f"connection pool: {stats['checkouts']} checkouts, "
+            f"wait avg {stats['wait_time_avg'] * 1000:.2f}ms max {stats['wait_time_max'] * 1000:.2f}ms, "
+            f"{stats['connections_opened']} opened, {stats['connections_closed']} closed, "
+            f"{stats['timeouts']} timeouts, {stats['health_check_failures']} failed health checks")
+
+
+def _pool_report():
+    stats = pool_stats()
+    return format_pool_stats(stats) if stats else None
+
+
+def close_pool():
+    global _pool, _closed_stats
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            # Scripts close the pool before the exit report, which still wants the numbers
+            _closed_stats = _pool.stats()
+            _pool = None
+
+
+query_stats.report_section(_pool_report)
@@ -2,6 +2,10 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+import db_pool
+import query_registry
+from listing_cache import get_listing_details
+from listing_search import listing_filter_clauses, nearby_listings, search_listings
 
 load_dotenv()
 
@@ -12,8 +16,12 @@ class Explorer:
         self.conn = self._get_connection()
 
     def _get_connection(self):
-        DB_URL = os.getenv("DATABASE_URL")
-        return psycopg2.connect(DB_URL, cursor_factory=RealDictCursor)
+        return db_pool.getconn()
+
+    def close(self):
+        if self.conn is not None:
+            db_pool.putconn(self.conn)
+            self.conn = None
 
     def _input_filters(self):
         filters = {}
@@ -44,41 +52,33 @@ class Explorer:
             WHERE saved_listings.user_id = %s
         '''
         params = [user_id]
-        if filters.get('price_min'):
-            query += " AND listings.price >= %s"
-            params.append(filters['price_min'])
-        if filters.get('price_max'):
-            query += " AND listings.price <= %s"
-            params.append(filters['price_max'])
-        if filters.get('property_type'):
-            query += " AND listings.property_type = %s"
-            params.append(filters['property_type'])
-        if filters.get('bedrooms'):
-            query += " AND listings.bedrooms >= %s"
-            params.append(filters['bedrooms'])
-        if filters.get('bathrooms'):
-            query += " AND listings.bathrooms >= %s"
-            params.append(filters['bathrooms'])
+        clauses, filter_params = listing_filter_clauses(filters, alias="listings")
+        for clause in clauses:
+            query += f" AND {clause}"
+        params.extend(filter_params)
         query += " ORDER BY listings.created_at DESC LIMIT 20"
 
-        cur = self.conn.cursor()
-        cur.execute(query, params)
+        cur = self.conn.cursor(cursor_factory=RealDictCursor)
+        query_registry.execute_dynamic(cur, "saved_listings", query, params)
         return cur.fetchall()
 
     def _show_listing_details(self, listing_id):
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM listings WHERE id = %s", (listing_id,))
-        listing = cur.fetchone()
+        try:
+            listing = get_listing_details(self.conn, listing_id)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(" Database Error:", e)
+            return
         if not listing:
             print("Listing not found.")
             return
 
         print("\n=== Listing Details ===")
         for key in listing:
-            print(f"{key}: {listing[key]}")
+            if key != 'media':
+                print(f"{key}: {listing[key]}")
 
-        cur.execute("SELECT url, media_type, caption FROM listing_media WHERE listing_id = %s ORDER BY display_order", (listing_id,))
-        media = cur.fetchall()
+        media = listing['media']
         if media:
             print("\nMedia:")
             for m in media:
@@ -86,9 +86,53 @@ class Explorer:
         else:
             print("No media available.")
 
+    def _search(self, filters):
+        query = input("Search (title, description or address): ").strip()
+        if not query:
+            print("Search text is required.")
+            return
+        try:
+            results = search_listings(query, filters, conn=self.conn)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(" Database Error:", e)
+            return
+        if not results:
+            print("No listings matched your search.")
+            return
+        print("\n--- Search Results ---")
+        for i, p in enumerate(results, start=1):
+            print(f"{i}. {p['title']} | Ksh {p['price']} | {p['property_type']} | {p['bedrooms']}bd/{p['bathrooms']}ba | ID: {p['id']}")
+
+    def _near_me(self, filters):
+        coords = input("Your location as 'latitude,longitude': ").strip()
+        try:
+            lat, lng = map(float, coords.split(','))
+        except ValueError:
+            print("Invalid format. Please enter like: -1.286389,36.817223")
+            return
+        radius = input("Search radius in km (leave blank for nearest): ").strip()
+        try:
+            radius_m = float(radius) * 1000 if radius else None
+        except ValueError:
+            print("Radius must be a number.")
+            return
+        try:
+            results = nearby_listings(lat, lng, radius_m=radius_m, filters=filters, conn=self.conn)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(" Database Error:", e)
+            return
+        if not results:
+            print("No listings found nearby.")
+            return
+        print("\n--- Nearby Listings ---")
+        for i, p in enumerate(results, start=1):
+            print(f"{i}. {p['title']} | Ksh {p['price']} | {p['property_type']} | {p['distance_m'] / 1000:.2f} km | ID: {p['id']}")
+
     def get_properties(self, user_id):
         try:
-            with self.conn.cursor() as cur:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT id, listing_id, notes, created_at, updated_at
                     FROM saved_listings
@@ -118,8 +162,10 @@ class Explorer:
             print("2. Set Filters")
             print("3. View Listing Details")
             print("4. View Saved Listings")
-            print("5. open chat")
-            print("6. Exit")
+            print("5. Search Listings")
+            print("6. Listings Near Me")
+            print("7. open chat")
+            print("8. Exit")
             choice = input("Select option: ")
             if choice == '1':
                 properties = self._list_properties(user_id, filters)
@@ -137,15 +183,18 @@ class Explorer:
             elif choice == '4':
                 self.get_properties(user_id)
             elif choice == '5':
+                self._search(filters)
+            elif choice == '6':
+                self._near_me(filters)
+            elif choice == '7':
                 try:
                     from chatsystem import ChatSystem  
-                    chat_app = ChatSystem(self.conn, self.current_user_id)
+                    chat_app = ChatSystem(self.conn, user_id)
                     chat_app.cli_interface()  
                 except Exception as e:
                     print(f"⚠️Failed to launch chat system: {e}")    
-            elif choice == '6':
+            elif choice == '8':
                 print(" Goodbye!")
-                self.conn.close()
                 break
             else:
 
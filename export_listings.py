@@ -0,0 +1,175 @@
+"""Export listings to CSV, JSONL or Parquet without loading the table into memory.
+
+    python export_listings.py --format parquet --output snapshots/listings.parquet
+    python export_listings.py --format jsonl --output changes.jsonl --state-file .export_state.json
+
+Rows stream through a server-side cursor ordered by (updated_at, id). With
+--state-file, the last exported key is remembered and the next run only
+exports listings updated since then. The address JSONB is flattened into
+columns and the location is split into lat/lng.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import psycopg2
+import db_pool
+
+EXPORT_COLUMNS = [
+    "id", "user_id", "title", "description", "price", "property_type", "bedrooms",
+    "bathrooms", "square_feet", "street", "city", "county", "state", "zip",
+    "lat", "lng", "status", "created_at", "updated_at",
+]
+
+EXPORT_QUERY = """
+    SELECT id, user_id, title, description, price, property_type, bedrooms,
+           bathrooms, square_feet,
+           address->>'street', address->>'city', address->>'county',
+           address->>'state', address->>'zip',
+           ST_Y(location::geometry), ST_X(location::geometry),
+           status, created_at, updated_at
+    FROM listings
+"""
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.handle = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.handle)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.handle.close()
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.handle = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self.handle.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n")
+
+    def close(self):
+        self.handle.close()
+
+
+class ParquetSink:
+    """Writes each fetched chunk as one Parquet row group"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pipenv install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.string()), ("user_id", pa.string()), ("title", pa.string()),
+            ("description", pa.string()), ("price", pa.decimal128(12, 2)),
+            ("property_type", pa.string()), ("bedrooms", pa.int32()),
+            ("bathrooms", pa.decimal128(3, 1)), ("square_feet", pa.int32()),
+            ("street", pa.string()), ("city", pa.string()), ("county", pa.string()),
+            ("state", pa.string()), ("zip", pa.string()),
+            ("lat", pa.float64()), ("lng", pa.float64()), ("status", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")), ("updated_at", pa.timestamp("us", tz="UTC")),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="snappy")
+
+    def write(self, rows):
+        columns = {name: list(values) for name, values in zip(EXPORT_COLUMNS, zip(*rows))}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+SINKS = {"csv": CsvSink, "jsonl": JsonlSink, "parquet": ParquetSink}
+
+
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        state = json.load(handle)
+    return (state["updated_at"], state["id"])
+
+
+def save_state(path, key):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump({"updated_at": key[0].isoformat(), "id": str(key[1])}, handle)
+    os.replace(tmp_path, path)
+
+
+def export_listings(conn, sink, since=None, chunk_rows=10000, progress=sys.stderr):
+    """Stream listings after the optional (updated_at, id) key into `sink`; returns (rows, last key)"""
+    query = EXPORT_QUERY
+    params = []
+    if since:
+        query += " WHERE (updated_at, id) > (%s::timestamptz, %s::uuid)"
+        params.extend(since)
+    query += " ORDER BY updated_at, id"
+
+    exported = 0
+    last_key = None
+    started = time.perf_counter()
+    with conn.cursor(name=f"listing_export_{uuid.uuid4().hex}") as cur:
+        cur.itersize = chunk_rows
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            sink.write(rows)
+            exported += len(rows)
+            last_key = (rows[-1][-1], rows[-1][0])
+            if progress:
+                rate = exported / (time.perf_counter() - started)
+                progress.write(f"exported {exported:,} rows ({rate:,.0f} rows/s)\r")
+                progress.flush()
+    conn.commit()
+    if progress:
+        progress.write("\n")
+    return exported, last_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=sorted(SINKS), default="csv")
+    parser.add_argument("--output", required=True, help="file to write")
+    parser.add_argument("--since", help="only export listings updated after this ISO timestamp")
+    parser.add_argument("--state-file", help="remember the last exported key for incremental runs")
+    parser.add_argument("--chunk-rows", type=int, default=10000, help="rows fetched (and Parquet row group size) per chunk")
+    args = parser.parse_args()
+
+    since = load_state(args.state_file)
+    if args.since:
+        since = (datetime.fromisoformat(args.since), "00000000-0000-0000-0000-000000000000")
+
+    sink = SINKS[args.format](args.output)
+    try:
+        with db_pool.connection() as conn:
+            exported, last_key = export_listings(conn, sink, since, args.chunk_rows)
+    except psycopg2.Error as e:
+        print(f"❌Database Error: {e}")
+        sys.exit(1)
+    finally:
+        sink.close()
+        db_pool.close_pool()
+
+    if args.state_file and last_key:
+        save_state(args.state_file, last_key)
+    print(f"✅Exported {exported:,} listings to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
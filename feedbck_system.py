@@ -1,23 +1,88 @@
 import psycopg2
 import uuid
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from dotenv import load_dotenv
 import os
+import db_pool
+import query_registry
+from listing_cache import invalidate_listing
+from Real_estate import insert_listing_media
 
 # Load .env variables
 load_dotenv()
 
+REVIEWS_PAGE_SIZE = 10
+
+# First three media URLs of the reviewed listing, read straight off the
+# (listing_id, display_order) index once per review row
+REVIEW_MEDIA_LATERAL = """
+    LEFT JOIN LATERAL (
+        SELECT ARRAY_AGG(top.url ORDER BY top.display_order) AS media_urls
+        FROM (
+            SELECT url, display_order
+            FROM listing_media
+            WHERE listing_id = r.listing_id
+            ORDER BY display_order
+            LIMIT 3
+        ) top
+    ) media ON TRUE
+"""
+
+
+def _review_page(sql, params, limit, before):
+    """Append the (created_at, id) keyset seek, ordering and page size"""
+    if before:
+        sql += " AND (r.created_at, r.id) < (%s::timestamptz, %s::uuid)"
+        params.extend(before)
+    sql += " ORDER BY r.created_at DESC, r.id DESC LIMIT %s"
+    params.append(limit)
+    return sql, params
+
+
+def user_reviews_query(user_id, limit=REVIEWS_PAGE_SIZE, before=None):
+    """One page of a reviewer's reviews, newest first, resuming after `before` = (created_at, id)"""
+    sql = f"""
+        SELECT r.id, l.title, r.rating, r.comment, r.created_at, media.media_urls
+        FROM reviews r
+        JOIN listings l ON r.listing_id = l.id
+        {REVIEW_MEDIA_LATERAL}
+        WHERE r.reviewer_id = %s
+    """
+    return _review_page(sql, [user_id], limit, before)
+
+
+def listing_reviews_query(listing_id, limit=REVIEWS_PAGE_SIZE, before=None):
+    """One page of a listing's reviews, newest first, resuming after `before` = (created_at, id)"""
+    sql = f"""
+        SELECT r.id, u.username, r.rating, r.comment, r.created_at, media.media_urls
+        FROM reviews r
+        JOIN users u ON r.reviewer_id = u.id
+        {REVIEW_MEDIA_LATERAL}
+        WHERE r.listing_id = %s
+    """
+    return _review_page(sql, [listing_id], limit, before)
+
+
+LISTING_RATING_STATS_SQL = """
+    SELECT review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5
+    FROM listing_rating_stats
+    WHERE listing_id = %s
+"""
+query_registry.register("listing_rating_stats", LISTING_RATING_STATS_SQL)
+
+
 class FeedbackSystem:
     def __init__(self, current_user_id):
         self.current_user_id = current_user_id
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            sslmode="require"
-        )
-        
+        self.conn = db_pool.getconn()
+
+    def close(self):
+        """Hand the borrowed connection back to the pool"""
+        if self.conn is not None:
+            db_pool.putconn(self.conn)
+            self.conn = None
+
     def review_menu(self):
         while True:
             print("\n=== REVIEW MANAGEMENT ===")
@@ -128,34 +193,39 @@ class FeedbackSystem:
                     )
                 )
 
+                attached = 0
                 if media_urls:
-                    for idx, url in enumerate(media_urls):
-                        media_id = str(uuid.uuid4())
-                        cur.execute(
-                            """
-                            INSERT INTO listing_media (
-                                id, listing_id, url, media_type, caption, display_order, created_at
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """,
-                            (
-                                media_id,
-                                listing_id,
-                                url,
-                                'image',
-                                None,
-                                idx + 1,
-                                now
-                            )
-                        )
+                    attached = insert_listing_media(cur, listing_id, media_urls)
+                    print(f"\nAttached {attached} media items")
 
                 self.conn.commit()
-                return review_id
+            if attached:
+                invalidate_listing(listing_id)
+            return review_id
 
         except psycopg2.Error as e:
             self.conn.rollback()
             print(f"\nDatabase Error: {e}")
             return False
 
+    def _print_review(self, heading, rating, comment, created_at, media_urls):
+        print(f"\n{heading}")
+        print(f"Date: {created_at.strftime('%Y-%m-%d')}")
+        print(f"Rating: {'★' * rating}{'☆' * (5 - rating)}")
+        if comment:
+            print(f"Comment: {comment}")
+        if media_urls and media_urls[0]:
+            print(f"Media: {len([m for m in media_urls if m])} items")
+        print("-" * 40)
+
+    def _more_reviews(self, page):
+        """Keyset for the next page, or None when the user is done or there is nothing left"""
+        if len(page) < REVIEWS_PAGE_SIZE:
+            return None
+        if input("Press enter for more reviews or 'q' to stop: ").strip().lower() == 'q':
+            return None
+        return (page[-1][4], page[-1][0])
+
     def view_my_reviews(self):
         if not self.current_user_id:
             print("\nPlease login first")
@@ -167,16 +237,14 @@ class FeedbackSystem:
             return
 
         print("\n=== YOUR REVIEWS ===")
-        for review in reviews:
-            id, title, rating, comment, created_at, media_urls = review
-            print(f"\nListing: {title}")
-            print(f"Date: {created_at.strftime('%Y-%m-%d')}")
-            print(f"Rating: {'★' * rating}{'☆' * (5 - rating)}")
-            if comment:
-                print(f"Comment: {comment}")
-            if media_urls and media_urls[0]:
-                print(f"Media: {len([m for m in media_urls if m])} items")
-            print("-" * 40)
+        while reviews:
+            for review in reviews:
+                id, title, rating, comment, created_at, media_urls = review
+                self._print_review(f"Listing: {title}", rating, comment, created_at, media_urls)
+            before = self._more_reviews(reviews)
+            if not before:
+                break
+            reviews = self.get_user_reviews(self.current_user_id, before=before)
 
     def view_listing_reviews(self):
         listing_id = input("Enter listing ID to view reviews: ").strip()
@@ -188,19 +256,20 @@ class FeedbackSystem:
             print("\nNo reviews for this listing yet")
             return
 
-        avg, count = self.calculate_listing_rating(listing_id)
+        stats = self.get_listing_rating_stats(listing_id)
+        avg, count = self._rating_average(stats)
         print(f"\n=== LISTING REVIEWS ({avg:.1f}★ from {count} reviews) ===")
+        for stars in range(5, 0, -1):
+            print(f"{stars}★ {stats['histogram'][stars - 1]}")
 
-        for review in reviews:
-            id, username, rating, comment, created_at, media_urls = review
-            print(f"\nReview by: {username}")
-            print(f"Date: {created_at.strftime('%Y-%m-%d')}")
-            print(f"Rating: {'★' * rating}{'☆' * (5 - rating)}")
-            if comment:
-                print(f"Comment: {comment}")
-            if media_urls and media_urls[0]:
-                print(f"Media: {len([m for m in media_urls if m])} items")
-            print("-" * 40)
+        while reviews:
+            for review in reviews:
+                id, username, rating, comment, created_at, media_urls = review
+                self._print_review(f"Review by: {username}", rating, comment, created_at, media_urls)
+            before = self._more_reviews(reviews)
+            if not before:
+                break
+            reviews = self.get_listing_reviews(listing_id, before=before)
 
     def get_saved_listings(self, user_id):
         try:
@@ -235,73 +304,96 @@ class FeedbackSystem:
             print(f"Database error: {e}")
             return False
 
-    def get_user_reviews(self, user_id):
+    def get_user_reviews(self, user_id, limit=REVIEWS_PAGE_SIZE, before=None):
         try:
             with self.conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT r.id, l.title, r.rating, r.comment, r.created_at, 
-                           ARRAY_AGG(lm.url) AS media_urls
-                    FROM reviews r
-                    JOIN listings l ON r.listing_id = l.id
-                    LEFT JOIN listing_media lm ON lm.listing_id = l.id AND lm.id IN (
-                        SELECT id FROM listing_media 
-                        WHERE listing_id = l.id 
-                        ORDER BY display_order 
-                        LIMIT 3
-                    )
-                    WHERE r.reviewer_id = %s
-                    GROUP BY r.id, l.title
-                    ORDER BY r.created_at DESC
-                    """,
-                    (user_id,)
-                )
+                cur.execute(*user_reviews_query(user_id, limit, before))
                 return cur.fetchall()
         except psycopg2.Error as e:
+            self.conn.rollback()
             print(f"Database error: {e}")
             return []
 
-    def get_listing_reviews(self, listing_id):
+    def get_listing_reviews(self, listing_id, limit=REVIEWS_PAGE_SIZE, before=None):
         try:
             with self.conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT r.id, u.username, r.rating, r.comment, r.created_at, 
-                           ARRAY_AGG(lm.url) AS media_urls
-                    FROM reviews r
-                    JOIN users u ON r.reviewer_id = u.id
-                    LEFT JOIN listing_media lm ON lm.listing_id = r.listing_id AND lm.id IN (
-                        SELECT id FROM listing_media 
-                        WHERE listing_id = r.listing_id 
-                        ORDER BY display_order 
-                        LIMIT 3
-                    )
-                    WHERE r.listing_id = %s
-                    GROUP BY r.id, u.username
-                    ORDER BY r.created_at DESC
-                    """,
-                    (listing_id,)
-                )
+                cur.execute(*listing_reviews_query(listing_id, limit, before))
                 return cur.fetchall()
         except psycopg2.Error as e:
+            self.conn.rollback()
             print(f"Database error: {e}")
             return []
 
+    def get_listing_rating_stats(self, listing_id):
+        """Count, sum and per-star histogram for a listing (primary-key lookup)"""
+        try:
+            with self.conn.cursor() as cur:
+                query_registry.execute(cur, "listing_rating_stats", (listing_id,))
+                result = cur.fetchone()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"Database error: {e}")
+            result = None
+        if not result:
+            return {"count": 0, "sum": 0, "histogram": [0, 0, 0, 0, 0]}
+        return {"count": result[0], "sum": result[1], "histogram": list(result[2:])}
+
+    def _rating_average(self, stats):
+        if not stats["count"]:
+            return (0, 0)
+        average = (Decimal(stats["sum"]) / stats["count"]).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+        return (average, stats["count"])
+
     def calculate_listing_rating(self, listing_id):
+        return self._rating_average(self.get_listing_rating_stats(listing_id))
+
+    def rebuild_rating_stats(self):
+        """Recompute listing_rating_stats from scratch (backfill or repair)"""
         try:
             with self.conn.cursor() as cur:
+                cur.execute("LOCK TABLE reviews IN SHARE MODE")
+                cur.execute("DELETE FROM listing_rating_stats")
                 cur.execute(
                     """
-                    SELECT AVG(rating)::numeric(10,1), COUNT(*)
+                    INSERT INTO listing_rating_stats (
+                        listing_id, review_count, rating_sum,
+                        stars_1, stars_2, stars_3, stars_4, stars_5
+                    )
+                    SELECT listing_id, COUNT(*), SUM(rating),
+                           COUNT(*) FILTER (WHERE rating = 1),
+                           COUNT(*) FILTER (WHERE rating = 2),
+                           COUNT(*) FILTER (WHERE rating = 3),
+                           COUNT(*) FILTER (WHERE rating = 4),
+                           COUNT(*) FILTER (WHERE rating = 5)
                     FROM reviews
-                    WHERE listing_id = %s
-                    """,
-                    (listing_id,)
+                    GROUP BY listing_id
+                    """
                 )
-                result = cur.fetchone()
-                return result if result else (0, 0)
+                rebuilt = cur.rowcount
+                self.conn.commit()
+                return rebuilt
         except psycopg2.Error as e:
+            self.conn.rollback()
             print(f"Database error: {e}")
-            return (0, 0)
+            return None
+
 
-   
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Review maintenance commands")
+    parser.add_argument("--rebuild-rating-stats", action="store_true",
+                        help="recompute listing_rating_stats from the reviews table")
+    args = parser.parse_args()
+
+    if args.rebuild_rating_stats:
+        feedback = FeedbackSystem(None)
+        try:
+            rebuilt = feedback.rebuild_rating_stats()
+            if rebuilt is not None:
+                print(f"Rebuilt rating stats for {rebuilt} listings")
+        finally:
+            feedback.close()
+            db_pool.close_pool()
+    else:
+        parser.print_help()
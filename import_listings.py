@@ -0,0 +1,311 @@
+"""Bulk-import listings from a CSV or JSONL file.
+
+    python import_listings.py properties.csv --user agent_username
+
+Each row needs a title and either an `address` JSON object or street/city/
+county/state/zip columns; `lat`/`lng` become the PostGIS location. Rows that
+would violate the listings constraints are written to the rejects file
+instead of failing the import. Valid rows are COPY'd into a staging table in
+batches and merged into listings with one INSERT ... ON CONFLICT per batch,
+so re-importing a file with `id` values updates those listings in place.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import psycopg2
+import db_pool
+from Real_estate import LISTING_STATUSES, PROPERTY_TYPES
+
+ADDRESS_FIELDS = ["street", "city", "county", "state", "zip"]
+STAGE_COLUMNS = [
+    "line_no", "id", "title", "description", "price", "property_type", "bedrooms",
+    "bathrooms", "square_feet", "address", "lat", "lng", "status",
+]
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(row, field, kind, limit=None, scale=None):
+    """Parse a numeric field; `scale` rounds Decimals to that many places the way NUMERIC(p, scale) will"""
+    value = _text(row.get(field))
+    if value is None:
+        return None
+    try:
+        number = int(value) if kind is int else Decimal(value)
+    except (ValueError, InvalidOperation):
+        raise RowError(f"{field} must be {'a whole number' if kind is int else 'a number'}")
+    if kind is not int and not number.is_finite():
+        raise RowError(f"{field} must be a finite number")
+    if limit is not None and abs(number) >= limit:
+        raise RowError(f"{field} is out of range")
+    if scale is not None:
+        # 99.96 passes the limit but rounds to 100.0, which overflows NUMERIC(3,1) during COPY
+        number = number.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+        if limit is not None and abs(number) >= limit:
+            raise RowError(f"{field} is out of range")
+    return number
+
+
+def validate_row(row):
+    """Normalise one input row to staging values, raising RowError if the listings table would reject it"""
+    listing_id = _text(row.get("id"))
+    try:
+        listing_id = str(uuid.UUID(listing_id)) if listing_id else str(uuid.uuid4())
+    except ValueError:
+        raise RowError("id is not a valid UUID")
+
+    title = _text(row.get("title"))
+    if not title:
+        raise RowError("title is required")
+    if len(title) > 100:
+        raise RowError("title is longer than 100 characters")
+
+    property_type = _text(row.get("property_type"))
+    if property_type:
+        property_type = property_type.lower()
+        if property_type not in PROPERTY_TYPES:
+            raise RowError(f"property_type must be one of {PROPERTY_TYPES}")
+
+    status = (_text(row.get("status")) or "active").lower()
+    if status not in LISTING_STATUSES:
+        raise RowError(f"status must be one of {LISTING_STATUSES}")
+
+    price = _number(row, "price", Decimal, limit=Decimal("1e10"), scale=2)
+    bathrooms = _number(row, "bathrooms", Decimal, limit=100, scale=1)
+    bedrooms = _number(row, "bedrooms", int, limit=2 ** 31)
+    square_feet = _number(row, "square_feet", int, limit=2 ** 31)
+
+    address = row.get("address")
+    if isinstance(address, str) and address.strip():
+        try:
+            address = json.loads(address)
+        except ValueError:
+            raise RowError("address is not valid JSON")
+    if not address:
+        address = {field: _text(row.get(field)) for field in ADDRESS_FIELDS if _text(row.get(field))}
+    if not isinstance(address, dict) or not address:
+        raise RowError("address is required")
+
+    lat = _number(row, "lat", Decimal)
+    lng = _number(row, "lng", Decimal)
+    if (lat is None) != (lng is None):
+        raise RowError("lat and lng must be given together")
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise RowError("lat/lng are outside valid coordinates")
+
+    return [
+        listing_id, title, _text(row.get("description")), price, property_type, bedrooms,
+        bathrooms, square_feet, json.dumps(address), lat, lng, status,
+    ]
+
+
+def read_rows(path, file_format):
+    """Yield (line_no, row dict) from a CSV or JSONL file without loading it all"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            for line_no, row in enumerate(csv.DictReader(handle), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = {"__error__": f"invalid JSON: {e}", "__raw__": line.rstrip("\n")}
+                yield line_no, row
+
+
+class ListingImporter:
+    def __init__(self, conn, user_id, batch_size=10000, rejects=None, progress=sys.stderr):
+        self.conn = conn
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.rejects = rejects
+        self.progress = progress
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    def _create_stage(self):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS listing_import_stage (
+                    line_no BIGINT,
+                    id UUID,
+                    title TEXT,
+                    description TEXT,
+                    price NUMERIC(12,2),
+                    property_type TEXT,
+                    bedrooms INT,
+                    bathrooms NUMERIC(3,1),
+                    square_feet INT,
+                    address JSONB,
+                    lat DOUBLE PRECISION,
+                    lng DOUBLE PRECISION,
+                    status TEXT
+                ) ON COMMIT DELETE ROWS
+                """
+            )
+        self.conn.commit()
+
+    def _reject(self, line_no, row, reason):
+        self.rejected += 1
+        if self.rejects:
+            self.rejects.write(json.dumps({"line": line_no, "error": reason, "row": row}, default=str) + "\n")
+
+    def _flush(self, buffer, staged):
+        """COPY one batch into staging and merge it into listings in the same transaction"""
+        if not staged:
+            return
+        buffer.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY listing_import_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cur.execute(
+                """
+                INSERT INTO listings (
+                    id, user_id, title, description, price, property_type, bedrooms,
+                    bathrooms, square_feet, address, location, status, created_at, updated_at
+                )
+                SELECT DISTINCT ON (s.id)
+                       s.id, %s, s.title, s.description, s.price, s.property_type, s.bedrooms,
+                       s.bathrooms, s.square_feet, s.address,
+                       CASE WHEN s.lat IS NULL THEN NULL
+                            ELSE ST_SetSRID(ST_MakePoint(s.lng, s.lat), 4326)::geography END,
+                       s.status, NOW(), NOW()
+                FROM listing_import_stage s
+                ORDER BY s.id, s.line_no DESC
+                ON CONFLICT (id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    description = EXCLUDED.description,
+                    price = EXCLUDED.price,
+                    property_type = EXCLUDED.property_type,
+                    bedrooms = EXCLUDED.bedrooms,
+                    bathrooms = EXCLUDED.bathrooms,
+                    square_feet = EXCLUDED.square_feet,
+                    address = EXCLUDED.address,
+                    location = EXCLUDED.location,
+                    status = EXCLUDED.status,
+                    updated_at = NOW()
+                WHERE listings.user_id = EXCLUDED.user_id
+                """,
+                (self.user_id,)
+            )
+            merged = cur.rowcount
+        self.conn.commit()
+        self.imported += merged
+        self.skipped += staged - merged
+        self._report()
+
+    def _report(self, final=False):
+        if not self.progress:
+            return
+        elapsed = time.perf_counter() - self.started
+        rate = self.read / elapsed if elapsed else 0
+        end = "\n" if final else "\r"
+        self.progress.write(
+            f"read {self.read:,} | imported {self.imported:,} | rejected {self.rejected:,} | "
+            f"skipped {self.skipped:,} | {rate:,.0f} rows/s{end}"
+        )
+        self.progress.flush()
+
+    def run(self, rows):
+        """Import (line_no, row) pairs; returns a summary dict"""
+        self._create_stage()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        staged = 0
+        try:
+            for line_no, row in rows:
+                self.read += 1
+                if "__error__" in row:
+                    self._reject(line_no, row.get("__raw__"), row["__error__"])
+                    continue
+                try:
+                    values = validate_row(row)
+                except RowError as e:
+                    self._reject(line_no, row, str(e))
+                    continue
+                writer.writerow([line_no] + values)
+                staged += 1
+                if staged >= self.batch_size:
+                    self._flush(buffer, staged)
+                    buffer.seek(0)
+                    buffer.truncate()
+                    staged = 0
+            self._flush(buffer, staged)
+        except psycopg2.Error:
+            self.conn.rollback()
+            raise
+        self._report(final=True)
+        return {
+            "read": self.read,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "skipped": self.skipped,
+            "seconds": time.perf_counter() - self.started,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or JSONL file of listings")
+    parser.add_argument("--user", required=True, help="username that will own the imported listings")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--rejects", help="where to write rejected rows (default: <path>.rejects.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per COPY + merge")
+    args = parser.parse_args()
+
+    file_format = args.format or ("jsonl" if os.path.splitext(args.path)[1].lower() in (".jsonl", ".ndjson") else "csv")
+    rejects_path = args.rejects or f"{args.path}.rejects.jsonl"
+
+    try:
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM users WHERE username = %s", (args.user,))
+                row = cur.fetchone()
+            if not row:
+                print(f"User '{args.user}' not found.")
+                sys.exit(1)
+
+            with open(rejects_path, "w", encoding="utf-8") as rejects:
+                importer = ListingImporter(conn, row[0], batch_size=args.batch_size, rejects=rejects)
+                summary = importer.run(read_rows(args.path, file_format))
+    except psycopg2.Error as e:
+        print(f"\n❌Database Error: {e}")
+        sys.exit(1)
+    finally:
+        db_pool.close_pool()
+
+    print(f"✅Imported {summary['imported']:,} of {summary['read']:,} rows in {summary['seconds']:.1f}s "
+          f"({summary['read'] / max(summary['seconds'], 1e-9):,.0f} rows/s)")
+    if summary["rejected"]:
+        print(f"⚠️{summary['rejected']:,} rows rejected - see {rejects_path}")
+    if summary["skipped"]:
+        print(f"⚠️{summary['skipped']:,} rows skipped (duplicate ids in the file or listings owned by another user)")
+
+
+if __name__ == "__main__":
+    main()
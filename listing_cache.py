@@ -0,0 +1,147 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LISTING_DETAILS_SQL = """
+    SELECT l.id, l.user_id, l.title, l.description, l.price, l.property_type, l.bedrooms,
+           l.bathrooms, l.square_feet, l.address, l.location, l.status, l.created_at,
+           l.updated_at, COALESCE(m.media, '[]'::json) AS media
+    FROM listings l
+    LEFT JOIN LATERAL (
+        SELECT json_agg(
+                   json_build_object('url', url, 'media_type', media_type, 'caption', caption)
+                   ORDER BY display_order
+               ) AS media
+        FROM listing_media
+        WHERE listing_id = l.id
+    ) m ON TRUE
+    WHERE l.id = %s
+"""
+
+
+class ListingCache:
+    """In-process LRU cache of listing detail views with a TTL.
+
+    Bounded both by entry count and by the approximate (pickled) size of the
+    cached rows. Writers in this process call `invalidate()` after changing a
+    listing or its media. Nothing is shared between processes: changes made
+    elsewhere (another CLI, import_listings.py, seed_data.py) are only seen
+    once the entry's TTL runs out, so the TTL is the staleness bound.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0, "invalidations": 0}
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, listing_id):
+        """Cached details for `listing_id`, or None on a miss or expired entry"""
+        key = str(listing_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics["misses"] += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._metrics["expirations"] += 1
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return value
+
+    def put(self, listing_id, value):
+        key = str(listing_id)
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._metrics["evictions"] += 1
+
+    def invalidate(self, listing_id):
+        with self._lock:
+            if str(listing_id) in self._entries:
+                self._drop(str(listing_id))
+                self._metrics["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._metrics["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide listing cache, sized from LISTING_CACHE_* environment variables"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ListingCache(
+                max_entries=int(os.getenv("LISTING_CACHE_ENTRIES", "512")),
+                max_bytes=int(os.getenv("LISTING_CACHE_BYTES", str(8 * 1024 * 1024))),
+                ttl=float(os.getenv("LISTING_CACHE_TTL", "60")),
+            )
+        return _cache
+
+
+def get_listing_details(conn, listing_id, cache=None):
+    """Listing row with its ordered `media` list; served from the cache when possible.
+
+    A miss costs one query (listing and media together); a hit costs none.
+    Returns None if the listing does not exist.
+    """
+    cache = cache or get_cache()
+    details = cache.get(listing_id)
+    if details is not None:
+        return details
+    with conn.cursor() as cur:
+        cur.execute(LISTING_DETAILS_SQL, (listing_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        details = dict(zip([column[0] for column in cur.description], row))
+    cache.put(listing_id, details)
+    return details
+
+
+def invalidate_listing(listing_id):
+    get_cache().invalidate(listing_id)
+
+
+def cache_stats():
+    return get_cache().stats()
@@ -0,0 +1,157 @@
+from psycopg2.extras import RealDictCursor
+import db_pool
+
+SEARCH_COLUMNS = """
+    l.id, l.title, l.price, l.property_type, l.bedrooms, l.bathrooms, l.status
+"""
+
+
+def listing_filter_clauses(filters, alias="l"):
+    """Turn Explorer-style filters into SQL conditions and their parameters"""
+    clauses = []
+    params = []
+    filters = filters or {}
+    if filters.get('price_min'):
+        clauses.append(f"{alias}.price >= %s")
+        params.append(filters['price_min'])
+    if filters.get('price_max'):
+        clauses.append(f"{alias}.price <= %s")
+        params.append(filters['price_max'])
+    if filters.get('property_type'):
+        clauses.append(f"{alias}.property_type = %s")
+        params.append(filters['property_type'])
+    if filters.get('bedrooms'):
+        clauses.append(f"{alias}.bedrooms >= %s")
+        params.append(filters['bedrooms'])
+    if filters.get('bathrooms'):
+        clauses.append(f"{alias}.bathrooms >= %s")
+        params.append(filters['bathrooms'])
+    if filters.get('status'):
+        clauses.append(f"{alias}.status = %s")
+        params.append(filters['status'])
+    return clauses, params
+
+
+def _run(conn, query, params):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+# Full-text matches ranked per search; common terms match far more rows than
+# are worth ranking, so only this many (in index order) are scored
+SEARCH_CANDIDATES = 1000
+
+
+def search_listings_query(query, filters=None, limit=20):
+    """Build the ranked full-text search over a bounded set of GIN matches; returns (sql, params)"""
+    clauses, filter_params = listing_filter_clauses(filters)
+    where = "".join(f" AND {clause}" for clause in clauses)
+    sql = f"""
+        SELECT {SEARCH_COLUMNS}, ts_rank_cd(l.search_vector, q.tsq) AS rank
+        FROM (
+            SELECT l.* FROM listings l
+            WHERE l.search_vector @@ websearch_to_tsquery('english', %s){where}
+            LIMIT %s
+        ) l, websearch_to_tsquery('english', %s) AS q(tsq)
+        ORDER BY rank DESC, l.created_at DESC
+        LIMIT %s
+    """
+    return sql, [query, *filter_params, SEARCH_CANDIDATES, query, limit]
+
+
+def fuzzy_listings_query(query, filters=None, limit=20, exclude_ids=()):
+    """Build the typo-tolerant title lookup: k-NN on the GiST trigram index; returns (sql, params)
+
+    Takes the `limit` closest titles by trigram distance, then keeps those
+    at least as similar as pg_trgm.similarity_threshold.
+    """
+    clauses, filter_params = listing_filter_clauses(filters)
+    params = [query]
+    sql = f"""
+        SELECT * FROM (
+            SELECT {SEARCH_COLUMNS}, similarity(l.title, %s) AS rank
+            FROM listings l
+            WHERE TRUE
+    """
+    if exclude_ids:
+        sql += " AND l.id <> ALL(%s::uuid[])"
+        params.append([str(listing_id) for listing_id in exclude_ids])
+    for clause in clauses:
+        sql += f" AND {clause}"
+    params.extend(filter_params)
+    sql += """
+            ORDER BY l.title <-> %s
+            LIMIT %s
+        ) nearest
+        WHERE nearest.title %% %s
+        ORDER BY rank DESC
+    """
+    params.extend([query, limit, query])
+    return sql, params
+
+
+def search_listings(query, filters=None, limit=20, conn=None):
+    """Ranked full-text + fuzzy title search over listings.
+
+    Matches the maintained `search_vector` (title, description, address),
+    ranking at most SEARCH_CANDIDATES matches. Only when that finds fewer
+    than `limit` listings are the rest filled with the closest titles by
+    trigram distance, so typos still hit.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    if conn is None:
+        with db_pool.connection() as pooled:
+            return search_listings(query, filters, limit, pooled)
+    results = _run(conn, *search_listings_query(query, filters, limit))
+    if len(results) < limit:
+        exclude_ids = [row["id"] for row in results]
+        results += _run(conn, *fuzzy_listings_query(query, filters, limit - len(results), exclude_ids))
+    return results
+
+
+POINT_SQL = "ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography"
+
+
+def nearby_listings_query(lat, lng, radius_m=None, bbox=None, filters=None, limit=20):
+    """Build the "near me" query: nearest listings first, optionally fenced by a radius or bounding box.
+
+    `bbox` is (min_lat, min_lng, max_lat, max_lng). Every spatial predicate
+    and the `<->` ordering are written against the raw `location` column so
+    the GIST index on it drives both the filter and the k-NN sort.
+    """
+    sql = f"""
+        SELECT {SEARCH_COLUMNS},
+               ST_Distance(l.location, {POINT_SQL}) AS distance_m
+        FROM listings l
+        WHERE l.location IS NOT NULL
+    """
+    params = [lng, lat]
+    if radius_m is not None:
+        sql += f" AND ST_DWithin(l.location, {POINT_SQL}, %s)"
+        params.extend([lng, lat, radius_m])
+    if bbox is not None:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        sql += " AND l.location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography"
+        params.extend([min_lng, min_lat, max_lng, max_lat])
+
+    clauses, filter_params = listing_filter_clauses(filters)
+    for clause in clauses:
+        sql += f" AND {clause}"
+    params.extend(filter_params)
+
+    sql += f" ORDER BY l.location <-> {POINT_SQL} LIMIT %s"
+    params.extend([lng, lat, limit])
+    return sql, params
+
+
+def nearby_listings(lat, lng, radius_m=None, bbox=None, filters=None, limit=20, conn=None):
+    """Listings closest to (lat, lng) with their distance in metres"""
+    sql, params = nearby_listings_query(lat, lng, radius_m, bbox, filters, limit)
+    if conn is not None:
+        return _run(conn, sql, params)
+    with db_pool.connection() as pooled:
+        return _run(pooled, sql, params)
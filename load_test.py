@@ -0,0 +1,314 @@
+"""Replay a mixed read/write workload against the repository functions.
+
+    python seed_data.py --rows 1000000
+    python load_test.py --threads 16 --duration 60 --mix balanced
+
+Each thread holds one pooled connection and, until --duration runs out,
+picks operations at random by the weights of the chosen mix: the listing
+search, nearby, detail and review queries, the chat list/history, the agency
+dashboard, logins, and the chat and media writes. Ids are sampled from the
+users seeded by seed_data.py (--prefix) before the clock starts. Prints
+throughput and p50/p95/p99 latency per operation and overall.
+"""
+import argparse
+import random
+import threading
+import time
+
+import psycopg2
+import db_pool
+import query_registry
+import query_stats
+from auth import get_auth_service
+from benchmark import percentile
+from chatsystem import ChatSystem
+from cli_app import LOGIN_SQL
+from dashboard import AgencyDashboard
+from feedbck_system import listing_reviews_query, user_reviews_query
+from listing_cache import ListingCache, get_listing_details
+from listing_search import nearby_listings, search_listings
+from Real_estate import insert_listing_media
+from seed_data import CITIES, NEIGHBOURHOODS, PROPERTY_TYPES, SEED_PREFIX, seeded_prefix, seeded_users
+from session_store import SessionStore
+
+# Relative weights per operation; writes are login, send_message, mark_read and attach_media
+MIXES = {
+    "read-heavy": {
+        "search": 15, "nearby": 15, "listing_details": 25, "listing_reviews": 8, "user_reviews": 5,
+        "rating_stats": 5, "chat_list": 8, "chat_history": 8, "dashboard": 3,
+        "login": 4, "send_message": 2, "mark_read": 1, "attach_media": 1,
+    },
+    "balanced": {
+        "search": 10, "nearby": 10, "listing_details": 15, "listing_reviews": 5, "user_reviews": 3,
+        "rating_stats": 3, "chat_list": 8, "chat_history": 8, "dashboard": 3,
+        "login": 10, "send_message": 15, "mark_read": 6, "attach_media": 4,
+    },
+    "write-heavy": {
+        "search": 5, "nearby": 5, "listing_details": 8, "listing_reviews": 3, "user_reviews": 2,
+        "rating_stats": 2, "chat_list": 5, "chat_history": 5, "dashboard": 2,
+        "login": 13, "send_message": 35, "mark_read": 10, "attach_media": 5,
+    },
+}
+SEARCH_TERMS = NEIGHBOURHOODS + [city for city, _, _, _ in CITIES] + PROPERTY_TYPES + [
+    "garden", "borehole", "rooftop terrace", "3 bedroom", "apartmnet", "Kilimnai",
+]
+
+query_registry.register("login", LOGIN_SQL)
+
+
+class Sample:
+    """Ids the workload draws from, loaded once before the run"""
+
+    def __init__(self, conn, prefix, size):
+        seeded, params = seeded_users("u.username", prefix)
+        params += (size,)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT u.id, u.username FROM users u WHERE {seeded} ORDER BY random() LIMIT %s",
+                params
+            )
+            self.users = cur.fetchall()
+            cur.execute(
+                f"""
+                SELECT l.id FROM listings l JOIN users u ON u.id = l.user_id
+                WHERE {seeded} ORDER BY random() LIMIT %s
+                """,
+                params
+            )
+            self.listings = [row[0] for row in cur.fetchall()]
+            cur.execute(
+                f"""
+                SELECT ci.conversation_id, ci.user_id FROM conversation_inbox ci
+                JOIN users u ON u.id = ci.user_id
+                WHERE {seeded} ORDER BY random() LIMIT %s
+                """,
+                params
+            )
+            self.conversations = cur.fetchall()
+            cur.execute(
+                f"""
+                SELECT a.id FROM agencies a JOIN users u ON u.id = a.user_id
+                WHERE {seeded} ORDER BY random() LIMIT %s
+                """,
+                params
+            )
+            self.agencies = [row[0] for row in cur.fetchall()]
+        conn.rollback()
+
+    def missing(self):
+        return [name for name in ("users", "listings", "conversations", "agencies") if not getattr(self, name)]
+
+
+class Worker:
+    """One simulated client: a connection, a random stream and per-operation latencies"""
+
+    def __init__(self, conn, sample, weights, cache, password, seed):
+        self.conn = conn
+        self.sample = sample
+        self.cache = cache
+        self.password = password
+        self.rng = random.Random(seed)
+        self.operations = list(weights)
+        self.weights = [weights[name] for name in self.operations]
+        self.latencies = {name: [] for name in self.operations}
+        self.errors = {name: 0 for name in self.operations}
+        self.first_errors = {}
+        self.died = None
+        self.auth = get_auth_service()
+        # Records logins (last_active) like the CLI, without writing session token files
+        self.sessions = SessionStore(secret=None)
+
+    # Reads
+
+    def search(self):
+        search_listings(self.rng.choice(SEARCH_TERMS), conn=self.conn)
+
+    def nearby(self):
+        _, _, lat, lng = self.rng.choice(CITIES)
+        nearby_listings(lat + self.rng.gauss(0, 0.05), lng + self.rng.gauss(0, 0.05), radius_m=5000, conn=self.conn)
+
+    def listing_details(self):
+        get_listing_details(self.conn, self.rng.choice(self.sample.listings), cache=self.cache)
+
+    def listing_reviews(self):
+        with self.conn.cursor() as cur:
+            cur.execute(*listing_reviews_query(self.rng.choice(self.sample.listings)))
+            cur.fetchall()
+
+    def user_reviews(self):
+        with self.conn.cursor() as cur:
+            cur.execute(*user_reviews_query(self.rng.choice(self.sample.users)[0]))
+            cur.fetchall()
+
+    def rating_stats(self):
+        with self.conn.cursor() as cur:
+            query_registry.execute(cur, "listing_rating_stats", (self.rng.choice(self.sample.listings),))
+            cur.fetchall()
+
+    def chat_list(self):
+        user_id, _ = self.rng.choice(self.sample.users)
+        ChatSystem(self.conn, user_id).list_user_chats()
+
+    def chat_history(self):
+        conversation_id, user_id = self.rng.choice(self.sample.conversations)
+        ChatSystem(self.conn, user_id).get_chat_messages(conversation_id)
+
+    def dashboard(self):
+        if AgencyDashboard(self.conn, self.rng.choice(self.sample.agencies)).load() is None:
+            raise RuntimeError("dashboard did not load")
+
+    # Writes
+
+    def login(self):
+        """LOGIN_SQL lookup, the bcrypt check and recording the login, as cli_app does it"""
+        _, username = self.rng.choice(self.sample.users)
+        with self.conn.cursor() as cur:
+            query_registry.execute(cur, "login", (username,))
+            row = cur.fetchone()
+        if not row or not self.auth.verify(self.password, row[5]):
+            raise RuntimeError(f"login failed for {username}")
+        if self.sessions.create(self.conn, row[0]) is None:
+            raise RuntimeError(f"could not record the login for {username}")
+
+    def send_message(self):
+        conversation_id, user_id = self.rng.choice(self.sample.conversations)
+        ChatSystem(self.conn, user_id).send_message(conversation_id, user_id, "Load test: is this still available?")
+
+    def mark_read(self):
+        conversation_id, user_id = self.rng.choice(self.sample.conversations)
+        ChatSystem(self.conn, user_id).mark_conversation_read(conversation_id, user_id)
+
+    def attach_media(self):
+        listing_id = self.rng.choice(self.sample.listings)
+        with self.conn.cursor() as cur:
+            insert_listing_media(cur, listing_id, [f"https://cdn.example.com/load-test/{listing_id}.jpg"])
+        self.conn.commit()
+        self.cache.invalidate(listing_id)
+
+    def _failed(self, name, error, counted=True):
+        if counted:
+            self.errors[name] += 1
+            self.first_errors.setdefault(name, f"{type(error).__name__}: {error}")
+        if not self.conn.closed:
+            try:
+                self.conn.rollback()
+            except psycopg2.Error:
+                pass
+
+    def run(self, deadline, measure_from):
+        """Replay operations until `deadline`; only those started after `measure_from` are recorded"""
+        try:
+            while True:
+                name = self.rng.choices(self.operations, self.weights)[0]
+                started = time.perf_counter()
+                if started >= deadline:
+                    return
+                try:
+                    getattr(self, name)()
+                except Exception as e:
+                    # Any failure is one failed operation; the client carries on
+                    self._failed(name, e, counted=started >= measure_from)
+                    continue
+                if started >= measure_from:
+                    self.latencies[name].append(time.perf_counter() - started)
+        except Exception as e:
+            self.died = e
+
+
+def print_results(workers, seconds):
+    print(f"\n{'operation':<16} {'ops':>8} {'err':>5} {'ops/s':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    every = []
+    errors = 0
+    for name in workers[0].operations:
+        latencies = [t * 1000 for worker in workers for t in worker.latencies[name]]
+        failed = sum(worker.errors[name] for worker in workers)
+        every.extend(latencies)
+        errors += failed
+        if not latencies and not failed:
+            continue
+        mean = sum(latencies) / len(latencies) if latencies else 0.0
+        print(f"{name:<16} {len(latencies):>8} {failed:>5} {len(latencies) / seconds:>9.1f} {mean:>8.2f} "
+              f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}")
+    mean = sum(every) / len(every) if every else 0.0
+    print(f"{'total':<16} {len(every):>8} {errors:>5} {len(every) / seconds:>9.1f} {mean:>8.2f} "
+          f"{percentile(every, 50):>8.2f} {percentile(every, 95):>8.2f} {percentile(every, 99):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="balanced", help="operation weights to replay")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients, one connection each")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring starts")
+    parser.add_argument("--prefix", type=seeded_prefix, default=SEED_PREFIX,
+                        help="username prefix of the seeded users")
+    parser.add_argument("--password", default="seedpass", help="password the seeded users share")
+    parser.add_argument("--sample", type=int, default=2000, help="ids of each kind to draw from")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the operation streams")
+    parser.add_argument("--no-cache", action="store_true", help="send every listing detail view to the database")
+    parser.add_argument("--profile", action="store_true", help="also print per-call-site query stats")
+    args = parser.parse_args()
+
+    if args.profile:
+        query_stats.configure(enabled=True)
+    pool = db_pool.ConnectionPool(minconn=0, maxconn=args.threads, **db_pool.connect_kwargs())
+    cache = ListingCache(max_entries=0) if args.no_cache else ListingCache()
+    conns = []
+    try:
+        with pool.connection() as conn:
+            sample = Sample(conn, args.prefix, args.sample)
+        missing = sample.missing()
+        if missing:
+            print(f"⚠️No seeded {', '.join(missing)} found for prefix '{args.prefix}' - run seed_data.py first")
+            raise SystemExit(1)
+
+        workers = []
+        for index in range(args.threads):
+            conn = pool.getconn()
+            conns.append(conn)
+            # Reads should not sit in an open transaction between operations
+            conn.autocommit = True
+            workers.append(Worker(conn, sample, MIXES[args.mix], cache, args.password, args.seed + index))
+
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+        print(f"Running '{args.mix}' with {args.threads} threads for {args.duration:g}s "
+              f"(+{args.warmup:g}s warm-up)...")
+        threads = [threading.Thread(target=worker.run, args=(deadline, measure_from)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print_results(workers, args.duration)
+        first_errors = {}
+        for worker in workers:
+            for name, error in worker.first_errors.items():
+                first_errors.setdefault(name, error)
+        for name, error in first_errors.items():
+            print(f"⚠️{name}: {error}")
+        dead = [worker.died for worker in workers if worker.died is not None]
+        broken = [name for name in workers[0].operations
+                  if sum(w.errors[name] for w in workers) and not any(w.latencies[name] for w in workers)]
+        if not args.no_cache:
+            stats = cache.stats()
+            print(f"\nlisting cache: {stats['hit_rate']:.0%} hit rate over {stats['hits'] + stats['misses']} lookups")
+        print(db_pool.format_pool_stats(pool.stats()))
+        if args.profile:
+            query_stats.print_report()
+        if dead or broken:
+            for error in dead:
+                print(f"❌A worker stopped early ({type(error).__name__}: {error}); the numbers above are incomplete")
+            if broken:
+                print(f"❌Every call failed for: {', '.join(broken)}")
+            raise SystemExit(1)
+    finally:
+        for conn in conns:
+            pool.putconn(conn)
+        pool.closeall()
+        get_auth_service().shutdown()
+
+
+if __name__ == "__main__":
+    main()
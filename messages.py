@@ -1,209 +1,163 @@
-def mark_messages_read(self, chat_id, user_id):
-    """Mark all unread messages in a chat as read for the user"""
-    try:
-        with self.conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE chats
-                SET read = TRUE
-                WHERE chat_id = %s AND user_id = %s AND read = FALSE
-                """,
-                (chat_id, user_id)
-            )
-            self.conn.commit()
-            print("✅Messages marked as read.")
-    except psycopg2.Error as e:
-        self.conn.rollback()
-        print(f"❌Database Error: {e}")
-
-
-def chat_interface(self, current_user_id):
-    chat_id = input("Enter chat ID: ").strip()
-    self.mark_messages_read(chat_id, current_user_id)
-    
-    messages = self.get_chat_messages(chat_id)
-    for msg in messages:
-        sender, text, attachments, is_read, time = msg
-        print(f"[{time.strftime('%H:%M')}] {sender}: {text}")
-    
-    while True:
-        msg = input("You: ")
-        if msg.lower() == "exit":
-            break
-        self.send_message(
-            user_id=self.get_agency_user_id(chat_id),
-            chat_id=chat_id,
-            sender_id=current_user_id,
-            message=msg
-        )
-
-
-def get_chat_messages(self, chat_id):
-    """Retrieve all messages for a specific chat"""
-    try:
-        with self.conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT sender_id, message, attachments, read, created_at
-                FROM chats
-                WHERE chat_id = %s
-                ORDER BY created_at ASC
-                """,
-                (chat_id,)
-            )
-            return cur.fetchall()
-    except psycopg2.Error as e:
-        print(f"❌Database Error: {e}")
-        return []
-
-for msg in self.get_chat_messages(chat_id):
-    sender, text, attachments, is_read, time = msg
-    print(f"[{time.strftime('%Y-%m-%d %H:%M')}] {sender}: {text}")
-    if attachments:
-        print(f"  Attachments: {attachments}")
-
-
-
-def send_message(self, user_id, chat_id, sender_id, message, attachments=None):
-    """Insert a message into the chats table"""
-    try:
-        with self.conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO chats (
-                    id, user_id, chat_id, sender_id, message, attachments
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s
+import psycopg2
+import db_pool
+
+INBOX_THREAD_LIMIT = 50
+INBOX_PREVIEW_MESSAGES = 3
+
+
+class AgencyInbox:
+    """Inbox of every conversation the agency's owner takes part in.
+
+    The whole overview (threads, contacts, unread counts and the latest
+    messages of each thread) loads in two queries however many threads
+    there are.
+    """
+
+    def __init__(self, conn, agency_id):
+        self.conn = conn
+        self.agency_id = agency_id
+
+    def get_conversations(self, limit=INBOX_THREAD_LIMIT, messages_per_thread=INBOX_PREVIEW_MESSAGES):
+        """Threads newest first, each with its contact and latest messages (oldest first)"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT ci.conversation_id, ci.unread_count, ci.last_message_at,
+                           u.id, u.username, u.email, u.phone
+                    FROM agencies a
+                    JOIN conversation_inbox ci ON ci.user_id = a.user_id
+                    JOIN users u ON u.id = ci.peer_id
+                    WHERE a.id = %s
+                    ORDER BY ci.last_message_at DESC NULLS LAST
+                    LIMIT %s
+                    """,
+                    (self.agency_id, limit)
                 )
-                """,
-                (
-                    str(uuid.uuid4()),
-                    user_id,
-                    chat_id,
-                    sender_id,
-                    message,
-                    json.dumps(attachments) if attachments else None
+                threads = [
+                    {
+                        "conversation_id": row[0],
+                        "unread": row[1],
+                        "last_message_at": row[2],
+                        "contact": {"id": row[3], "username": row[4], "email": row[5], "phone": row[6]},
+                        "messages": [],
+                    }
+                    for row in cur.fetchall()
+                ]
+                if not threads:
+                    return []
+
+                by_id = {thread["conversation_id"]: thread for thread in threads}
+                cur.execute(
+                    """
+                    SELECT t.conversation_id, m.id, su.username, m.message,
+                           m.attachments, m.read, m.created_at
+                    FROM unnest(%s::uuid[]) AS t(conversation_id)
+                    CROSS JOIN LATERAL (
+                        SELECT id, sender_id, message, attachments, read, created_at
+                        FROM chats
+                        WHERE conversation_id = t.conversation_id
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s
+                    ) m
+                    JOIN users su ON su.id = m.sender_id
+                    ORDER BY t.conversation_id, m.created_at, m.id
+                    """,
+                    (list(by_id), messages_per_thread)
                 )
-            )
-            self.conn.commit()
-            print("✅Message sent successfully.")
-            return True
-    except psycopg2.Error as e:
-        self.conn.rollback()
-        print(f"❌Database Error: {e}")
-        return False
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-    def list_user_chats(self, user_id):
-    with self.conn.cursor() as cur:
-        cur.execute("""
-            SELECT c.id, u1.username AS contact_name
-            FROM conversations c
-            JOIN users u1 ON (CASE 
-                WHEN c.participant_1 = %s THEN c.participant_2
-                ELSE c.participant_1 END) = u1.id
-            WHERE c.participant_1 = %s OR c.participant_2 = %s
-        """, (user_id, user_id, user_id))
-        return cur.fetchall()  # [(conversation_id, contact_name), ...]
-    
-    
-
-
-    def get_or_create_conversation(self, user1_id, user2_id):
-    with self.conn.cursor() as cur:
-        ids = sorted([user1_id, user2_id])  # Ensure uniqueness
-        cur.execute("""
-            SELECT id FROM conversations 
-            WHERE participant_1 = %s AND participant_2 = %s
-        """, (ids[0], ids[1]))
-        row = cur.fetchone()
-        if row:
-            return row[0]
-        
-        conversation_id = str(uuid.uuid4())
-        cur.execute("""
-            INSERT INTO conversations (id, participant_1, participant_2)
-            VALUES (%s, %s, %s)
-        """, (conversation_id, ids[0], ids[1]))
-        self.conn.commit()
-        return conversation_id
-    
+                for conversation_id, *message in cur.fetchall():
+                    by_id[conversation_id]["messages"].append(message)
+                return threads
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"❌Database Error: {e}")
+            return []
+
+    def mark_all_read(self):
+        """Mark every incoming message in every agency thread read in one statement"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    WITH owner AS (
+                        SELECT user_id FROM agencies WHERE id = %s
+                    ),
+                    marked AS (
+                        UPDATE chats ch SET read = TRUE
+                        FROM conversation_inbox ci, owner
+                        WHERE ci.user_id = owner.user_id
+                          AND ch.conversation_id = ci.conversation_id
+                          AND ch.sender_id <> owner.user_id
+                          AND ch.read IS NOT TRUE
+                        RETURNING ch.conversation_id
+                    ),
+                    counts AS (
+                        SELECT conversation_id, COUNT(*) AS n FROM marked GROUP BY conversation_id
+                    ),
+                    reset AS (
+                        UPDATE conversation_inbox ci
+                        SET unread_count = GREATEST(ci.unread_count - counts.n, 0)
+                        FROM counts, owner
+                        WHERE ci.conversation_id = counts.conversation_id
+                          AND ci.user_id = owner.user_id
+                        RETURNING counts.n
+                    )
+                    SELECT COALESCE(SUM(n), 0) FROM reset
+                    """,
+                    (self.agency_id,)
+                )
+                marked = cur.fetchone()[0]
+                self.conn.commit()
+                print(f"✅{marked} messages marked as read.")
+                return marked
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"❌Database Error: {e}")
+            return 0
+
+    def show(self):
+        threads = self.get_conversations()
+        if not threads:
+            print("\n⚠️  No conversations yet.")
+            return threads
+
+        print("\n=== 📨 Agency Inbox ===")
+        for thread in threads:
+            contact = thread["contact"]
+            badge = f" ({thread['unread']} unread)" if thread["unread"] else ""
+            print("\n" + "-" * 50)
+            print(f"👤 {contact['username']}{badge}")
+            for _, sender, message, attachments, is_read, created_at in thread["messages"]:
+                print(f"  [{created_at.strftime('%Y-%m-%d %H:%M')}] {sender}: {message}")
+                if attachments:
+                    print(f"    Attachments: {attachments}")
+        print("-" * 50)
+        return threads
+
+    def menu(self, user_id):
+        while True:
+            self.show()
+            print("\n1. 💬 Open Conversations")
+            print("2. ✅ Mark All as Read")
+            print("3. 🔙 Back")
+            choice = input("Select option: ").strip()
+            if choice == "1":
+                from chatsystem import ChatSystem
+                ChatSystem(self.conn, user_id).cli_interface()
+            elif choice == "2":
+                self.mark_all_read()
+            elif choice == "3":
+                break
+            else:
+                print("⚠️Invalid option. Please try again.")
 
-    def send_message(self, conversation_id, sender_id, message, attachments=None):
-    with self.conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO chats (
-                id, conversation_id, sender_id, message, attachments
-            ) VALUES (%s, %s, %s, %s, %s)
-        """, (
-            str(uuid.uuid4()),
-            conversation_id,
-            sender_id,
-            message,
-            json.dumps(attachments) if attachments else None
-        ))
-        self.conn.commit()
-    
-    def get_chat_messages(self, conversation_id):
-    with self.conn.cursor() as cur:
-        cur.execute("""
-            SELECT u.username, c.message, c.created_at
-            FROM chats c
-            JOIN users u ON u.id = c.sender_id
-            WHERE c.conversation_id = %s
-            ORDER BY c.created_at ASC
-        """, (conversation_id,))
-        chats = cur.fetchall() 
-        return chats
-    if not chat in chats:
-        print("\n=== no chats ===")
-        print("1. Make New chat")
-        print("2. go back")
 
+if __name__ == "__main__":
+    import sys
 
-        choice = input("Select option: ").strip()
-        if choice == '1':
-            name = input("name : ").strip() 
-            if name:
-                get_or_create_conversation(self.current_user_id, name)
-                message = input("message : ").strip()
-                attachments = input("attatchments : ").strip()
-            else:
-                print("receipient name needed to send message")
-                if message or attachments:
-                    send_message(get_or_create_conversation(), self.current_user_id, message, attachments)
-                else:
-                    print('message or attatchment to be sent needed')
-        else if choice =='2':
-            break
-    else:
-         print("\n=== chats ===")
-         list_user_chats(self.current_user_id)
-         openchat = input("open chat : ").strip()
-         conver
-         if input:
-            get_chat_messages()
\ No newline at end of file
+    if len(sys.argv) != 2:
+        print("usage: python messages.py <agency id>")
+        sys.exit(1)
+    with db_pool.connection() as conn:
+        AgencyInbox(conn, sys.argv[1]).show()
+    db_pool.close_pool()
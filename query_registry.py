@@ -0,0 +1,168 @@
+"""Server-side prepared statements for the hot queries.
+
+Modules register their hot SQL once at import time:
+
+    register("chat_messages_latest", sql)
+
+and run it with `execute(cur, "chat_messages_latest", params)`; queries
+assembled per call use `execute_dynamic()`, which prepares each distinct
+shape under its own name. The first
+call on a pooled connection sends PREPARE and EXECUTE together in one round
+trip; later calls send only EXECUTE, so Postgres skips parsing and, once it
+settles on a generic plan, planning too. Per-statement call counts and
+latency are kept for `stats()`. Connections that do not come from db_pool
+(and so cannot remember what they prepared) fall back to plain execution.
+"""
+import hashlib
+import re
+import threading
+import time
+
+import psycopg2
+import psycopg2.errorcodes
+import query_stats
+
+DUPLICATE_PREPARED_STATEMENT = psycopg2.errorcodes.DUPLICATE_PREPARED_STATEMENT
+INVALID_SQL_STATEMENT_NAME = psycopg2.errorcodes.INVALID_SQL_STATEMENT_NAME
+_SAVEPOINT = "query_registry_prepare"
+
+# Attribute timings to the code that asked for the statement, not to this module
+query_stats.skip_file(__file__)
+
+_PARAM = re.compile(r"%s")
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class Statement:
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.param_count = len(_PARAM.findall(sql))
+        counter = iter(range(1, self.param_count + 1))
+        # %% stays escaped: the PREPARE text still goes through psycopg2's formatting
+        self.prepare_sql = f"PREPARE {name} AS " + _PARAM.sub(lambda _: f"${next(counter)}", sql)
+        self.execute_sql = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * self.param_count)})" if self.param_count else "")
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._statements = {}
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, name, sql):
+        """Declare a statement; registering the same name twice must use the same SQL"""
+        if not _NAME.match(name):
+            raise ValueError(f"statement name {name!r} must be a lower-case SQL identifier")
+        with self._lock:
+            existing = self._statements.get(name)
+            if existing is not None:
+                if existing.sql != sql:
+                    raise ValueError(f"statement {name!r} is already registered with different SQL")
+                return existing
+            statement = self._statements[name] = Statement(name, sql)
+            self._metrics[name] = {"calls": 0, "prepares": 0, "total_time": 0.0, "max_time": 0.0}
+            return statement
+
+    def execute(self, cur, name, params=()):
+        """Run a registered statement on `cur`, preparing it on this connection first if needed"""
+        statement = self._statements[name]
+        prepared = getattr(cur.connection, "prepared", None)
+        params = tuple(params)
+        started = time.perf_counter()
+        if prepared is None:
+            cur.execute(statement.sql, params)
+            prepares = 0
+        elif name in prepared:
+            try:
+                cur.execute(statement.execute_sql, params)
+                prepares = 0
+            except psycopg2.Error as e:
+                if e.pgcode != INVALID_SQL_STATEMENT_NAME:
+                    raise
+                # Lost server-side (e.g. DISCARD ALL). The failed EXECUTE aborted any open
+                # transaction, so only an autocommit connection can re-prepare right away;
+                # otherwise the next call after the caller's rollback does.
+                prepared.discard(name)
+                if not cur.connection.autocommit:
+                    raise
+                prepares = self._prepare(cur, statement, params, prepared)
+        else:
+            prepares = self._prepare(cur, statement, params, prepared)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            metrics = self._metrics[name]
+            metrics["calls"] += 1
+            metrics["prepares"] += prepares
+            metrics["total_time"] += elapsed
+            metrics["max_time"] = max(metrics["max_time"], elapsed)
+
+    def _prepare(self, cur, statement, params, prepared):
+        """PREPARE and EXECUTE in one round trip; returns 1 if this call prepared the statement.
+
+        The name is only recorded once the server is known to hold it: after
+        success, or after 42P05 (an earlier call prepared it and then failed
+        in EXECUTE). Inside a transaction the PREPARE is fenced by a savepoint
+        so a 42P05 can be rolled back and the EXECUTE re-sent.
+        """
+        in_transaction = not cur.connection.autocommit
+        # The PREPARE text has no %s left (they became $n), so the params fill the EXECUTE only
+        sql = f"{statement.prepare_sql}; {statement.execute_sql}"
+        if in_transaction:
+            sql = f"SAVEPOINT {_SAVEPOINT}; {statement.prepare_sql}; RELEASE SAVEPOINT {_SAVEPOINT}; {statement.execute_sql}"
+        try:
+            cur.execute(sql, params)
+        except psycopg2.Error as e:
+            if e.pgcode != DUPLICATE_PREPARED_STATEMENT:
+                raise
+            retry = statement.execute_sql
+            if in_transaction:
+                retry = f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}; RELEASE SAVEPOINT {_SAVEPOINT}; {retry}"
+            cur.execute(retry, params)
+            prepared.add(statement.name)
+            return 0
+        prepared.add(statement.name)
+        return 1
+
+    def execute_dynamic(self, cur, prefix, sql, params=()):
+        """Run SQL built at call time (e.g. optional filters), preparing each distinct shape once"""
+        name = f"{prefix}_{hashlib.sha1(sql.encode()).hexdigest()[:10]}"
+        self.register(name, sql)
+        self.execute(cur, name, params)
+
+    def forget(self, conn):
+        """Drop `conn`'s record of prepared statements (after DISCARD ALL or a server-side reset)"""
+        prepared = getattr(conn, "prepared", None)
+        if prepared is not None:
+            prepared.clear()
+
+    def stats(self):
+        """Per-statement call counts and latency in milliseconds"""
+        with self._lock:
+            snapshot = {name: dict(metrics) for name, metrics in self._metrics.items()}
+        for metrics in snapshot.values():
+            calls = metrics["calls"]
+            metrics["mean_ms"] = metrics["total_time"] * 1000 / calls if calls else 0.0
+            metrics["max_ms"] = metrics.pop("max_time") * 1000
+            metrics["total_ms"] = metrics.pop("total_time") * 1000
+        return snapshot
+
+
+registry = QueryRegistry()
+
+
+def register(name, sql):
+    return registry.register(name, sql)
+
+
+def execute(cur, name, params=()):
+    registry.execute(cur, name, params)
+
+
+def execute_dynamic(cur, prefix, sql, params=()):
+    registry.execute_dynamic(cur, prefix, sql, params)
+
+
+def stats():
+    return registry.stats()
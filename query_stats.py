@@ -0,0 +1,351 @@
+"""Per-call-site query instrumentation and slow-query log.
+
+When enabled (DB_PROFILE=1, or `python cli_app.py --profile`), every cursor
+handed out by db_pool records, per calling line of application code:
+calls, errors, a latency histogram, rows returned or affected, and an
+estimate of bytes fetched. Statements slower than DB_SLOW_QUERY_MS are
+written with their EXPLAIN plan to DB_SLOW_QUERY_LOG. `print_report()`
+prints the summary table; scripts that never call it get it at exit.
+
+When disabled, db_pool hands out plain cursors and nothing here runs.
+"""
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+EXPLAINABLE = ("select", "with", "insert", "update", "delete", "execute")
+
+_SKIP_FILES = {os.path.abspath(__file__)}
+_PSYCOPG2_DIR = os.path.dirname(os.path.abspath(psycopg2.__file__))
+
+_lock = threading.Lock()
+_sites = {}
+_settings = {
+    "enabled": os.getenv("DB_PROFILE", "").lower() in ("1", "true", "yes"),
+    "slow_ms": float(os.getenv("DB_SLOW_QUERY_MS", "500")),
+    "log_path": os.getenv("DB_SLOW_QUERY_LOG", "slow_queries.log"),
+}
+_slow_log = None
+_report = {"registered": False, "printed": False}
+# Callables returning an extra line for the report (or None), e.g. db_pool's pool metrics
+_report_sections = []
+
+
+def _report_at_exit():
+    if _settings["enabled"] and not _report["printed"] and _sites:
+        print_report()
+
+
+def _register_report():
+    """Print the summary when the process exits unless the script already printed it"""
+    if not _report["registered"]:
+        _report["registered"] = True
+        atexit.register(_report_at_exit)
+
+
+def report_section(section):
+    """Add `section()`'s line (skipped when it returns None) to the end of every report"""
+    _report_sections.append(section)
+
+
+def configure(enabled=True, slow_ms=None, log_path=None):
+    """Turn instrumentation on or off; `slow_ms=0` disables the slow-query log"""
+    global _slow_log
+    with _lock:
+        _settings["enabled"] = enabled
+        if slow_ms is not None:
+            _settings["slow_ms"] = slow_ms
+        if log_path is not None:
+            _settings["log_path"] = log_path
+            _slow_log = None
+    if enabled:
+        _register_report()
+
+
+def enabled():
+    return _settings["enabled"]
+
+
+def skip_file(path):
+    """Treat frames from `path` as plumbing when working out the calling line"""
+    _SKIP_FILES.add(os.path.abspath(path))
+
+
+def call_site(frame=None):
+    """'file.py:line function' of the first frame (from `frame` outwards) outside the database plumbing"""
+    frame = frame or sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _SKIP_FILES and not filename.startswith(_PSYCOPG2_DIR):
+            return f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+def _site(key):
+    site = _sites.get(key)
+    if site is None:
+        site = _sites[key] = {
+            "calls": 0, "errors": 0, "rows": 0, "bytes": 0,
+            "total_time": 0.0, "max_time": 0.0, "histogram": [0] * (len(BUCKETS_MS) + 1),
+        }
+    return site
+
+
+def record(key, elapsed, rows=0, nbytes=0, error=False):
+    """Add one execution (or fetch, with elapsed/rows/bytes only) to a call site"""
+    ms = elapsed * 1000
+    bucket = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+    with _lock:
+        site = _site(key)
+        site["calls"] += 1
+        site["errors"] += error
+        site["rows"] += rows
+        site["bytes"] += nbytes
+        site["total_time"] += elapsed
+        site["max_time"] = max(site["max_time"], elapsed)
+        site["histogram"][bucket] += 1
+
+
+def record_fetch(key, elapsed, rows, nbytes):
+    """Account rows fetched after execute() to the call site that ran the query"""
+    with _lock:
+        site = _site(key)
+        site["rows"] += rows
+        site["bytes"] += nbytes
+        site["total_time"] += elapsed
+
+
+def row_bytes(rows):
+    """Rough size of fetched rows: text/binary lengths, 8 bytes for anything else"""
+    total = 0
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        for value in values:
+            if isinstance(value, (str, bytes, bytearray, memoryview)):
+                total += len(value)
+            elif value is not None:
+                total += 8
+    return total
+
+
+def _logger():
+    global _slow_log
+    if _slow_log is None:
+        _slow_log = logging.getLogger("slow_queries")
+        _slow_log.propagate = False
+        _slow_log.setLevel(logging.INFO)
+        for handler in list(_slow_log.handlers):
+            _slow_log.removeHandler(handler)
+        handler = logging.FileHandler(_settings["log_path"], encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _slow_log.addHandler(handler)
+    return _slow_log
+
+
+def _explain(conn, query):
+    """EXPLAIN (without ANALYZE: nothing is run twice) for a single statement, or None.
+
+    Runs on the caller's connection, so inside the caller's transaction it is
+    fenced by a savepoint: a failing EXPLAIN must not abort the caller's work.
+    """
+    text = query.decode(errors="replace") if isinstance(query, bytes) else query
+    text = text.strip().rstrip(";")
+    if ";" in text or not text.lower().startswith(EXPLAINABLE):
+        return None
+    if conn.closed:
+        return None
+    status = conn.get_transaction_status()
+    if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return None
+    in_transaction = not conn.autocommit and status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    with psycopg2.extensions.cursor(conn) as cur:
+        if in_transaction:
+            cur.execute("SAVEPOINT query_stats_explain")
+        try:
+            cur.execute("EXPLAIN " + text)
+            plan = "\n".join(line for (line,) in cur.fetchall())
+        except psycopg2.Error as e:
+            plan = f"(EXPLAIN failed: {e})"
+            if in_transaction:
+                cur.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+        if in_transaction:
+            cur.execute("RELEASE SAVEPOINT query_stats_explain")
+        elif not conn.autocommit:
+            # The EXPLAIN opened a transaction the caller did not have
+            conn.rollback()
+    return plan
+
+
+def log_slow(key, elapsed, query, conn=None):
+    """Write a statement over the threshold, with its plan when one can be had, to the slow-query log"""
+    slow_ms = _settings["slow_ms"]
+    if not slow_ms or elapsed * 1000 < slow_ms:
+        return
+    text = query.decode(errors="replace") if isinstance(query, bytes) else str(query)
+    plan = _explain(conn, query) if conn is not None and query else None
+    message = f"{elapsed * 1000:.1f}ms at {key}\n{text.strip()}"
+    if plan:
+        message += "\n" + plan
+    with _lock:
+        _logger().info(message + "\n")
+
+
+class InstrumentedCursorMixin:
+    """Times execute()/executemany()/copy_expert() and counts what the fetches return"""
+
+    _site_key = None
+
+    def _timed(self, run, query):
+        key = self._site_key = call_site()
+        started = time.perf_counter()
+        try:
+            result = run()
+        except psycopg2.Error:
+            record(key, time.perf_counter() - started, error=True)
+            raise
+        elapsed = time.perf_counter() - started
+        # DML without RETURNING reports its size through rowcount; queries are counted as they are fetched
+        rows = self.rowcount if self.description is None and self.rowcount > 0 else 0
+        record(key, elapsed, rows=rows)
+        # Server-side cursors only DECLARE here; their cost shows up in the fetches
+        if self.name is None:
+            log_slow(key, elapsed, self.query or query, self.connection)
+        return result
+
+    def execute(self, query, vars=None):
+        return self._timed(lambda: super(InstrumentedCursorMixin, self).execute(query, vars), query)
+
+    def executemany(self, query, vars_list):
+        return self._timed(lambda: super(InstrumentedCursorMixin, self).executemany(query, vars_list), query)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(lambda: super(InstrumentedCursorMixin, self).copy_expert(sql, file, size), sql)
+
+    def _fetched(self, started, rows):
+        if self._site_key is not None and rows:
+            record_fetch(self._site_key, time.perf_counter() - started, len(rows), row_bytes(rows))
+        return rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if row is not None:
+            self._fetched(started, [row])
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        return self._fetched(started, rows)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        return self._fetched(started, super().fetchall())
+
+    def __iter__(self):
+        # Stream through the C iterator (named cursors fetch itersize rows per
+        # round trip) and only time the time spent inside it
+        iterator = super().__iter__()
+        rows = nbytes = 0
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    row = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                rows += 1
+                nbytes += row_bytes([row])
+                yield row
+        finally:
+            if self._site_key is not None and rows:
+                record_fetch(self._site_key, elapsed, rows, nbytes)
+
+
+_instrumented_classes = {}
+
+
+def instrumented(cursor_class):
+    """Subclass of `cursor_class` (psycopg2 cursor, RealDictCursor, ...) with instrumentation mixed in"""
+    cls = _instrumented_classes.get(cursor_class)
+    if cls is None:
+        cls = type(f"Instrumented{cursor_class.__name__}", (InstrumentedCursorMixin, cursor_class), {})
+        _instrumented_classes[cursor_class] = cls
+    return cls
+
+
+def percentile_ms(histogram, pct):
+    """Upper bound of the histogram bucket holding the pct-th percentile"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target = pct / 100 * total
+    seen = 0
+    for bound, count in zip(BUCKETS_MS + [float("inf")], histogram):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+def stats():
+    """Snapshot of every call site, slowest total time first"""
+    with _lock:
+        snapshot = {key: dict(site, histogram=list(site["histogram"])) for key, site in _sites.items()}
+    for site in snapshot.values():
+        site["total_ms"] = site.pop("total_time") * 1000
+        site["max_ms"] = site.pop("max_time") * 1000
+        site["mean_ms"] = site["total_ms"] / site["calls"] if site["calls"] else 0.0
+        site["p50_ms"] = percentile_ms(site["histogram"], 50)
+        site["p95_ms"] = percentile_ms(site["histogram"], 95)
+        site["p99_ms"] = percentile_ms(site["histogram"], 99)
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def reset():
+    with _lock:
+        _sites.clear()
+
+
+def print_report(top=25, file=sys.stdout):
+    """Summary table of the busiest call sites (percentiles are histogram bucket bounds)"""
+    _report["printed"] = True
+    sites = stats()
+    if not sites:
+        print("No queries recorded.", file=file)
+    else:
+        _print_sites(sites, top, file)
+    for section in _report_sections:
+        line = section()
+        if line:
+            print(line, file=file)
+
+
+def _print_sites(sites, top, file):
+    print(f"\n{'call site':<48} {'calls':>6} {'err':>4} {'rows':>8} {'KiB':>9} "
+          f"{'total ms':>10} {'mean':>8} {'p50<=':>7} {'p95<=':>7} {'p99<=':>7} {'max':>8}", file=file)
+    for key, site in list(sites.items())[:top]:
+        print(f"{key[:48]:<48} {site['calls']:>6} {site['errors']:>4} {site['rows']:>8} "
+              f"{site['bytes'] / 1024:>9.1f} {site['total_ms']:>10.1f} {site['mean_ms']:>8.2f} "
+              f"{site['p50_ms']:>7g} {site['p95_ms']:>7g} {site['p99_ms']:>7g} {site['max_ms']:>8.1f}", file=file)
+    if len(sites) > top:
+        print(f"... {len(sites) - top} more call sites", file=file)
+
+
+if _settings["enabled"]:
+    _register_report()
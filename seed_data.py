@@ -0,0 +1,506 @@
+"""Generate a realistic synthetic dataset for every table with COPY.
+
+    python seed_data.py --rows 1000000
+    python seed_data.py --users 5000 --fast
+    python seed_data.py --clean
+
+Scale is set by --users, or by --rows (a target total row count, 10k to
+10M+), from which the number of users is derived. Every other table is
+sized per user or per listing (see RATIOS). Rows are generated in Python
+and streamed to COPY in batches, so memory stays flat at any scale; ids are
+derived from the row number, so nothing has to be kept around to link
+children to their parents. All seeded users are named <prefix><n> and share
+one password (--password), so the load test can log in as any of them.
+
+--fast skips row triggers while loading (needs superuser, see README) and
+rebuilds conversation_inbox and listing_rating_stats in one pass at the end.
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+import psycopg2
+import psycopg2.errorcodes
+import db_pool
+from feedbck_system import FeedbackSystem
+
+SEED_PREFIX = "seed_"
+
+# Rows per user (agents and listings), per listing (media, reviews) and per conversation (chats)
+RATIOS = {
+    "agent_share": 0.05,
+    "listings_per_user": 2,
+    "media_per_listing": 4,
+    "saved_per_user": 3,
+    "conversations_per_user": 2,
+    "chats_per_conversation": 10,
+    "reviews_per_listing": 1,
+}
+
+# (city, county, lat, lng) centres that listings are scattered around
+CITIES = [
+    ("Nairobi", "Nairobi", -1.2864, 36.8172),
+    ("Mombasa", "Mombasa", -4.0435, 39.6682),
+    ("Kisumu", "Kisumu", -0.0917, 34.7680),
+    ("Nakuru", "Nakuru", -0.3031, 36.0800),
+    ("Eldoret", "Uasin Gishu", 0.5143, 35.2698),
+    ("Thika", "Kiambu", -1.0333, 37.0693),
+    ("Malindi", "Kilifi", -3.2192, 40.1169),
+    ("Nyeri", "Nyeri", -0.4201, 36.9476),
+]
+CITY_WEIGHTS = [40, 15, 10, 10, 8, 7, 5, 5]
+NEIGHBOURHOODS = [
+    "Kilimani", "Westlands", "Karen", "Lavington", "Runda", "Kileleshwa", "Parklands",
+    "Nyali", "Bamburi", "Milimani", "Riverside", "Greenpark", "Hillview", "Lakeview",
+]
+STREETS = ["Ngong Road", "Argwings Kodhek", "Moi Avenue", "Kenyatta Avenue", "Oloitokitok Road",
+           "Links Road", "Oginga Odinga Street", "Mama Ngina Drive", "Kirichwa Road", "Jomo Kenyatta Highway"]
+FEATURES = ["a spacious garden", "a rooftop terrace", "backup water storage", "a borehole",
+            "solar water heating", "a gym and pool", "24-hour security", "an open-plan kitchen",
+            "servant quarters", "ample parking", "fibre internet", "a view of the city"]
+
+PROPERTY_TYPES = ["house", "apartment", "land", "commercial"]
+PROPERTY_WEIGHTS = [35, 45, 12, 8]
+# (min, max) price in KES per property type
+PRICE_RANGES = {
+    "house": (4_000_000, 120_000_000),
+    "apartment": (2_500_000, 45_000_000),
+    "land": (800_000, 60_000_000),
+    "commercial": (10_000_000, 400_000_000),
+}
+STATUSES = ["active", "pending", "sold", "rented"]
+STATUS_WEIGHTS = [70, 10, 10, 10]
+MEDIA_TYPES = ["image", "video", "virtual_tour", "floor_plan"]
+MEDIA_WEIGHTS = [80, 8, 6, 6]
+RATING_WEIGHTS = [5, 8, 17, 35, 35]
+
+REVIEW_COMMENTS = [
+    "Exactly as described, the agent was very responsive.",
+    "Great location but the photos are a bit generous.",
+    "Viewing was easy to arrange. Would recommend.",
+    "Price is high for the area.",
+    "Lovely neighbourhood, quiet at night.",
+    "Water pressure was an issue during the viewing.",
+    None,
+]
+CHAT_LINES = [
+    "Hi, is this property still available?",
+    "Yes it is. When would you like to view it?",
+    "Is the price negotiable?",
+    "There is some room for negotiation.",
+    "Can I come on Saturday morning?",
+    "Saturday at 10am works.",
+    "Are pets allowed?",
+    "Does the rent include service charge?",
+    "I'll send the floor plan shortly.",
+    "Thanks, see you then!",
+]
+AGENCY_WORDS = ["Prime", "Savannah", "Coastline", "Highland", "Acacia", "Summit", "Baobab", "Urban", "Keystone"]
+AGENCY_SUFFIXES = ["Realty", "Properties", "Homes", "Estates", "Property Group", "Realtors"]
+
+# High 64 bits of every seeded id, per table (the low 64 bits are the row number)
+ID_KINDS = ["user", "agency", "listing", "media", "saved", "conversation", "chat", "review"]
+
+
+def scale_plan(users):
+    """Row counts per table for `users` seeded users"""
+    users = max(users, 20)
+    listings = users * RATIOS["listings_per_user"]
+    conversations_per_user = min(RATIOS["conversations_per_user"], (users - 1) // 2)
+    conversations = users * conversations_per_user
+    return {
+        "users": users,
+        "agencies": max(1, int(users * RATIOS["agent_share"])),
+        "listings": listings,
+        "listing_media": listings * RATIOS["media_per_listing"],
+        "saved_listings": users * RATIOS["saved_per_user"],
+        "conversations": conversations,
+        "chats": conversations * RATIOS["chats_per_conversation"],
+        "reviews": listings * RATIOS["reviews_per_listing"],
+        "conversations_per_user": conversations_per_user,
+    }
+
+
+def users_for_rows(rows):
+    """Number of users whose plan comes to roughly `rows` rows in total"""
+    per_user = sum(v for k, v in scale_plan(1_000_000).items() if k != "conversations_per_user") / 1_000_000
+    return max(20, int(rows / per_user))
+
+
+def plan_total(plan):
+    return sum(count for table, count in plan.items() if table != "conversations_per_user")
+
+
+class Seeder:
+    def __init__(self, conn, plan, prefix=SEED_PREFIX, seed=42, password_hash="",
+                 batch_rows=50000, progress=sys.stderr):
+        self.conn = conn
+        self.plan = plan
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.password_hash = password_hash
+        self.batch_rows = batch_rows
+        self.progress = progress
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.id_bases = {kind: self.rng.getrandbits(64) << 64 for kind in ID_KINDS}
+        # Distinct offsets below users/2, so (user, user + offset) pairs never repeat in either order
+        self.offsets = self.rng.sample(range(1, (plan["users"] - 1) // 2 + 1), plan["conversations_per_user"])
+        self.written = {}
+        self.started = time.perf_counter()
+
+    def id(self, kind, n):
+        return str(uuid.UUID(int=self.id_bases[kind] | n))
+
+    def past(self, max_days):
+        return self.now - timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def agent_user(self, n):
+        """Agents are the first `agencies` users; agent n owns agency n"""
+        return n % self.plan["agencies"]
+
+    def _report(self, table, rows, started, final=False):
+        if not self.progress:
+            return
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        end = "\n" if final else "\r"
+        self.progress.write(f"{table:<16} {rows:>12,} / {self.plan[table]:,} rows | {rate:,.0f} rows/s{end}")
+        self.progress.flush()
+
+    def copy(self, table, columns, rows):
+        """Stream generated rows into `table` with one COPY (and commit) per batch"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        started = time.perf_counter()
+        written = pending = 0
+
+        def flush():
+            buffer.seek(0)
+            with self.conn.cursor() as cur:
+                cur.copy_expert(sql, buffer)
+            self.conn.commit()
+            buffer.seek(0)
+            buffer.truncate()
+
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= self.batch_rows:
+                flush()
+                written += pending
+                pending = 0
+                self._report(table, written, started)
+        if pending:
+            flush()
+            written += pending
+        self.written[table] = written
+        self._report(table, written, started, final=True)
+
+    # Row generators
+
+    def users(self):
+        for n in range(self.plan["users"]):
+            username = f"{self.prefix}{n}"
+            created_at = self.past(1095)
+            last_active = created_at + (self.now - created_at) * self.rng.random()
+            phone = f"+2547{n:08d}" if n < 10 ** 8 and self.rng.random() < 0.6 else None
+            yield (self.id("user", n), username, f"{username}@example.com", phone, self.password_hash,
+                   n < self.plan["agencies"], created_at.isoformat(), last_active.isoformat())
+
+    def agencies(self):
+        for n in range(self.plan["agencies"]):
+            name = f"{self.rng.choice(AGENCY_WORDS)} {self.rng.choice(AGENCY_SUFFIXES)} {n}"
+            yield (self.id("agency", n), self.id("user", n), name, f"{self.prefix.upper()}LIC-{n:08d}",
+                   f"{name} has been helping clients find homes since {2000 + n % 24}.",
+                   self.rng.random() < 0.6, f"https://cdn.example.com/agencies/{n}.png",
+                   self.past(1095).isoformat())
+
+    def listings(self):
+        rng = self.rng
+        for n in range(self.plan["listings"]):
+            city, county, lat, lng = rng.choices(CITIES, CITY_WEIGHTS)[0]
+            neighbourhood = rng.choice(NEIGHBOURHOODS)
+            property_type = rng.choices(PROPERTY_TYPES, PROPERTY_WEIGHTS)[0]
+            low, high = PRICE_RANGES[property_type]
+            price = round(rng.uniform(low, high), -3)
+            if property_type in ("house", "apartment"):
+                bedrooms = rng.randint(1, 6)
+                bathrooms = min(bedrooms + rng.choice([-0.5, 0, 0.5, 1]), 8)
+                square_feet = bedrooms * rng.randint(350, 700)
+                title = f"{bedrooms}-bedroom {property_type} in {neighbourhood}, {city}"
+            else:
+                bedrooms = bathrooms = None
+                square_feet = rng.randint(2000, 80000)
+                title = f"{property_type.title()} plot in {neighbourhood}, {city}"
+            description = (f"{title} with {rng.choice(FEATURES)} and {rng.choice(FEATURES)}. "
+                           f"Close to schools, shopping and public transport.")
+            address = {
+                "street": f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+                "city": city,
+                "county": county,
+                "state": "Kenya",
+                "zip": f"{rng.randint(100, 999)}00",
+            }
+            # ~0.25 degrees of scatter is about 25km around the city centre
+            point = f"SRID=4326;POINT({lng + rng.gauss(0, 0.08):.6f} {lat + rng.gauss(0, 0.08):.6f})"
+            created_at = self.past(730)
+            yield (self.id("listing", n), self.id("user", self.agent_user(n)), title, description, price,
+                   property_type, bedrooms, bathrooms, square_feet, json.dumps(address), point,
+                   rng.choices(STATUSES, STATUS_WEIGHTS)[0], created_at.isoformat(), created_at.isoformat())
+
+    def media(self):
+        per_listing = RATIOS["media_per_listing"]
+        for n in range(self.plan["listing_media"]):
+            listing, order = divmod(n, per_listing)
+            media_type = self.rng.choices(MEDIA_TYPES, MEDIA_WEIGHTS)[0]
+            extension = {"image": "jpg", "video": "mp4", "virtual_tour": "html", "floor_plan": "pdf"}[media_type]
+            listing_id = self.id("listing", listing)
+            yield (self.id("media", n), listing_id,
+                   f"https://cdn.example.com/listings/{listing_id}/{order + 1}.{extension}",
+                   media_type, f"Photo {order + 1}" if media_type == "image" else None, order + 1,
+                   self.past(730).isoformat())
+
+    def saved(self):
+        per_user = RATIOS["saved_per_user"]
+        n = 0
+        for user in range(self.plan["users"]):
+            for listing in self.rng.sample(range(self.plan["listings"]), per_user):
+                saved_at = self.past(365).isoformat()
+                notes = self.rng.choice([None, "Shortlist", "Ask about parking", "Too far from work?"])
+                yield (self.id("saved", n), self.id("user", user), self.id("listing", listing),
+                       notes, saved_at, saved_at)
+                n += 1
+
+    def conversation_participants(self, n):
+        """(participant_1, participant_2) of conversation n, ordered the way get_or_create stores them"""
+        user, slot = divmod(n, self.plan["conversations_per_user"])
+        a = uuid.UUID(self.id("user", user))
+        b = uuid.UUID(self.id("user", (user + self.offsets[slot]) % self.plan["users"]))
+        return (str(a), str(b)) if a.int < b.int else (str(b), str(a))
+
+    def conversations(self):
+        for n in range(self.plan["conversations"]):
+            yield (self.id("conversation", n),) + self.conversation_participants(n)
+
+    def chats(self):
+        per_conversation = RATIOS["chats_per_conversation"]
+        n = 0
+        for conversation in range(self.plan["conversations"]):
+            conversation_id = self.id("conversation", conversation)
+            participants = self.conversation_participants(conversation)
+            sent_at = self.past(365)
+            unread_from = per_conversation - self.rng.randint(0, 2)
+            sender = self.rng.randrange(2)
+            for line in range(per_conversation):
+                if self.rng.random() < 0.6:
+                    sender = 1 - sender
+                sent_at += timedelta(seconds=self.rng.randint(20, 6 * 3600))
+                yield (self.id("chat", n), conversation_id, participants[sender],
+                       CHAT_LINES[line % len(CHAT_LINES)], None, line < unread_from, sent_at.isoformat())
+                n += 1
+
+    def reviews(self):
+        for n in range(self.plan["reviews"]):
+            created_at = self.past(365).isoformat()
+            yield (self.id("review", n), self.id("listing", self.rng.randrange(self.plan["listings"])),
+                   self.id("user", self.rng.randrange(self.plan["users"])),
+                   self.rng.choices(range(1, 6), RATING_WEIGHTS)[0], self.rng.choice(REVIEW_COMMENTS),
+                   created_at, created_at)
+
+    def run(self):
+        """Seed every table in dependency order; returns rows written per table"""
+        self.copy("users", ["id", "username", "email", "phone", "password_hash", "is_agent",
+                            "created_at", "last_active"], self.users())
+        self.copy("agencies", ["id", "user_id", "name", "license_number", "bio", "verified",
+                               "profile_image_url", "created_at"], self.agencies())
+        # search_vector is generated by Postgres and cannot be COPY'd
+        self.copy("listings", ["id", "user_id", "title", "description", "price", "property_type", "bedrooms",
+                               "bathrooms", "square_feet", "address", "location", "status",
+                               "created_at", "updated_at"], self.listings())
+        self.copy("listing_media", ["id", "listing_id", "url", "media_type", "caption", "display_order",
+                                    "created_at"], self.media())
+        self.copy("saved_listings", ["id", "user_id", "listing_id", "notes", "created_at", "updated_at"],
+                  self.saved())
+        self.copy("conversations", ["id", "participant_1", "participant_2"], self.conversations())
+        self.copy("chats", ["id", "conversation_id", "sender_id", "message", "attachments", "read",
+                            "created_at"], self.chats())
+        self.copy("reviews", ["id", "listing_id", "reviewer_id", "rating", "comment", "created_at",
+                              "updated_at"], self.reviews())
+        return self.written
+
+
+def seeded_prefix(value):
+    """argparse type for --prefix: a non-empty username prefix"""
+    if not value:
+        raise argparse.ArgumentTypeError("the prefix must not be empty")
+    return value
+
+
+def seeded_users(column, prefix):
+    """WHERE clause and params matching usernames in `column` that are exactly <prefix><number>.
+
+    Compared with left()/substr() rather than LIKE, so `_` and `%` in the
+    prefix are literal, and the digits check keeps real users who merely
+    share the prefix ("seed_bob", "seedling") out of cleanup and sampling.
+    """
+    if not prefix:
+        raise ValueError("prefix must not be empty")
+    clause = f"(left({column}, %s) = %s AND substr({column}, %s) ~ '^[0-9]+$')"
+    return clause, (len(prefix), prefix, len(prefix) + 1)
+
+
+def rebuild_conversation_inbox(conn, prefix):
+    """Inbox rows (membership, unread badge, last message) for seeded conversations loaded without triggers"""
+    seeded, params = seeded_users("u.username", prefix)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO conversation_inbox (
+                conversation_id, user_id, peer_id, unread_count,
+                last_message_id, last_message_at, last_preview
+            )
+            SELECT c.id, p.user_id, p.peer_id,
+                   (SELECT COUNT(*) FROM chats m
+                    WHERE m.conversation_id = c.id AND m.sender_id <> p.user_id AND m.read IS NOT TRUE),
+                   last.id, last.created_at, left(last.message, 120)
+            FROM conversations c
+            JOIN users u ON u.id = c.participant_1 AND {seeded}
+            CROSS JOIN LATERAL (
+                VALUES (c.participant_1, c.participant_2), (c.participant_2, c.participant_1)
+            ) AS p(user_id, peer_id)
+            LEFT JOIN LATERAL (
+                SELECT id, created_at, message
+                FROM chats
+                WHERE conversation_id = c.id
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            ) last ON TRUE
+            ON CONFLICT (conversation_id, user_id) DO NOTHING
+            """,
+            params
+        )
+        rebuilt = cur.rowcount
+    conn.commit()
+    return rebuilt
+
+
+def cleanup(conn, prefix):
+    """Delete every seeded user and, through the cascades, everything they own"""
+    seeded, params = seeded_users("username", prefix)
+    with conn.cursor() as cur:
+        # listings.user_id is ON DELETE SET NULL, so seeded listings go first
+        cur.execute(f"DELETE FROM listings WHERE user_id IN (SELECT id FROM users WHERE {seeded})", params)
+        listings = cur.rowcount
+        cur.execute(f"DELETE FROM users WHERE {seeded}", params)
+        users = cur.rowcount
+    conn.commit()
+    return users, listings
+
+
+def analyze(conn, tables):
+    with conn.cursor() as cur:
+        for table in tables:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    scale = parser.add_mutually_exclusive_group()
+    scale.add_argument("--users", type=int, help="users to seed; every other table is sized from this")
+    scale.add_argument("--rows", type=int, default=10000, help="approximate total rows to seed (default 10000)")
+    parser.add_argument("--prefix", type=seeded_prefix, default=SEED_PREFIX,
+                        help="username prefix that marks seeded rows")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (same seed, same dataset)")
+    parser.add_argument("--password", default="seedpass", help="password shared by every seeded user")
+    parser.add_argument("--password-cost", type=int, default=4, help="bcrypt work factor for the shared hash")
+    parser.add_argument("--batch-rows", type=int, default=50000, help="rows per COPY + commit")
+    parser.add_argument("--fast", action="store_true",
+                        help="load with triggers off (superuser only) and rebuild their tables afterwards")
+    parser.add_argument("--clean", action="store_true", help="delete rows seeded with --prefix and exit")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without writing anything")
+    args = parser.parse_args()
+
+    plan = scale_plan(args.users if args.users else users_for_rows(args.rows))
+    try:
+        with db_pool.connection() as conn:
+            if args.clean:
+                users, listings = cleanup(conn, args.prefix)
+                print(f"✅Deleted {users:,} seeded users and {listings:,} listings (with everything they owned)")
+                return
+
+            print("Seeding:")
+            for table, count in plan.items():
+                if table != "conversations_per_user":
+                    print(f"  {table:<16} {count:>12,}")
+            print(f"  {'total':<16} {plan_total(plan):>12,}")
+            if args.dry_run:
+                return
+
+            with conn.cursor() as cur:
+                seeded, params = seeded_users("username", args.prefix)
+                cur.execute(f"SELECT 1 FROM users WHERE {seeded} LIMIT 1", params)
+                if cur.fetchone():
+                    print(f"⚠️Users named {args.prefix}* already exist - run with --clean first or pick another --prefix")
+                    sys.exit(1)
+
+            if args.fast:
+                # Also skips foreign key checks; the generated ids are consistent by construction
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SET session_replication_role = replica")
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    if e.pgcode == psycopg2.errorcodes.INSUFFICIENT_PRIVILEGE:
+                        print("❌--fast needs a superuser connection; run without it to load through the triggers")
+                        sys.exit(1)
+                    raise
+
+            password_hash = bcrypt.hashpw(args.password.encode(), bcrypt.gensalt(rounds=args.password_cost)).decode()
+            seeder = Seeder(conn, plan, prefix=args.prefix, seed=args.seed,
+                            password_hash=password_hash, batch_rows=args.batch_rows)
+            try:
+                written = seeder.run()
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+            finally:
+                if args.fast:
+                    with conn.cursor() as cur:
+                        cur.execute("SET session_replication_role = DEFAULT")
+                    conn.commit()
+
+            if args.fast:
+                print("Rebuilding conversation_inbox and listing_rating_stats...")
+                written["conversation_inbox"] = rebuild_conversation_inbox(conn, args.prefix)
+                feedback = FeedbackSystem(None)
+                try:
+                    written["listing_rating_stats"] = feedback.rebuild_rating_stats() or 0
+                finally:
+                    feedback.close()
+
+            analyze(conn, ["users", "agencies", "listings", "listing_media", "saved_listings",
+                           "conversations", "chats", "conversation_inbox", "reviews", "listing_rating_stats"])
+    except psycopg2.Error as e:
+        print(f"\n❌Database Error: {e}")
+        sys.exit(1)
+    finally:
+        db_pool.close_pool()
+
+    seconds = time.perf_counter() - seeder.started
+    total = sum(written.values())
+    print(f"✅Seeded {total:,} rows in {seconds:.1f}s ({total / max(seconds, 1e-9):,.0f} rows/s). "
+          f"Log in as {args.prefix}0 .. {args.prefix}{plan['users'] - 1} with password '{args.password}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SESSION_FILE = os.path.expanduser(os.getenv("SESSION_FILE", "~/.real_estate_session"))
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "168"))
+
+
+def token_hash(token):
+    """What the sessions table stores instead of the token itself"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore:
+    """Remembers a login between launches in a signed, expiring token file.
+
+    The file holds a random token, its expiry and an HMAC over both keyed by
+    SESSION_SECRET, so a tampered or expired file is rejected without touching
+    the database. The sessions table keeps only the token's SHA-256, and
+    resuming a session is one primary-key lookup. Without SESSION_SECRET the
+    store is disabled and every launch asks for a password as before.
+    """
+
+    def __init__(self, path=SESSION_FILE, secret=SESSION_SECRET, ttl_hours=SESSION_TTL_HOURS):
+        self.path = path
+        self.secret = secret.encode() if secret else None
+        self.ttl_hours = ttl_hours
+
+    @property
+    def enabled(self):
+        return self.secret is not None
+
+    def _sign(self, token, expires):
+        return hmac.new(self.secret, f"{token}.{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def _write(self, token, expires):
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump({"token": token, "expires": expires, "sig": self._sign(token, expires)}, handle)
+        os.replace(tmp_path, self.path)
+
+    def _clear_file(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        """Hash of the stored token if the file is present, untampered and unexpired, else None"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            token, expires, sig = data["token"], int(data["expires"]), data["sig"]
+            if not isinstance(token, str) or not isinstance(sig, str):
+                raise TypeError("token and sig must be strings")
+            # compare_digest also raises TypeError for non-ASCII strings
+            valid = hmac.compare_digest(sig, self._sign(token, expires))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            self._clear_file()
+            return None
+        if not valid or expires <= time.time():
+            self._clear_file()
+            return None
+        return token_hash(token)
+
+    def create(self, conn, user_id):
+        """Stamp the user's last_active and, when enabled, open a session and save its token.
+
+        Both writes go in one statement (one round trip), called only after
+        the password has been verified. Commits on `conn`; returns the new
+        last_active, or None if the statement failed.
+        """
+        token = secrets.token_urlsafe(32) if self.enabled else None
+        ttl_seconds = int(self.ttl_hours * 3600)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    WITH touched AS (
+                        UPDATE users SET last_active = NOW()
+                        WHERE id = %(user_id)s
+                        RETURNING last_active
+                    ),
+                    expired AS (
+                        DELETE FROM sessions
+                        WHERE %(token_hash)s::text IS NOT NULL
+                          AND user_id = %(user_id)s AND expires_at <= NOW()
+                    ),
+                    created AS (
+                        INSERT INTO sessions (token_hash, user_id, expires_at)
+                        SELECT %(token_hash)s, %(user_id)s, NOW() + make_interval(secs => %(ttl)s)
+                        WHERE %(token_hash)s::text IS NOT NULL
+                    )
+                    SELECT last_active FROM touched
+                    """,
+                    {"user_id": user_id, "token_hash": token_hash(token) if token else None, "ttl": ttl_seconds}
+                )
+                row = cur.fetchone()
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"⚠️Could not record this login: {e}")
+            return None
+        if token:
+            self._write(token, int(time.time()) + ttl_seconds)
+        return row[0] if row else None
+
+    def resume(self, conn):
+        """(user_id, username) for a valid saved session, or None; one indexed lookup"""
+        hashed = self.load()
+        if not hashed:
+            return None
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE sessions s SET last_used_at = NOW()
+                FROM users u
+                WHERE s.token_hash = %s AND s.expires_at > NOW() AND u.id = s.user_id
+                RETURNING s.user_id, u.username
+                """,
+                (hashed,)
+            )
+            row = cur.fetchone()
+        conn.commit()
+        if not row:
+            self._clear_file()
+        return row
+
+    def revoke(self, conn):
+        """Delete the saved session (logout); commits on `conn`"""
+        hashed = self.load()
+        self._clear_file()
+        if not hashed:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM sessions WHERE token_hash = %s", (hashed,))
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"⚠️Could not end the saved session: {e}")
+
+    def forget(self):
+        """Drop the local token file only (the row expires on its own)"""
+        self._clear_file()
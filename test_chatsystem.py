@@ -0,0 +1,92 @@
+import threading
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import db_pool
+from chatsystem import ChatSystem
+
+RACE_ROUNDS = 20
+
+
+@pytest.fixture
+def connect():
+    """Open connections to the database from .env/DATABASE_URL; skip when there is none"""
+    opened = []
+
+    def _connect():
+        try:
+            conn = psycopg2.connect(connect_timeout=5, **db_pool.connect_kwargs())
+        except psycopg2.OperationalError as e:
+            pytest.skip(f"no database: {e}")
+        opened.append(conn)
+        return conn
+
+    yield _connect
+    for conn in opened:
+        conn.close()
+
+
+@pytest.fixture
+def users(connect):
+    """Create `count` throwaway users and delete them (and their conversations) afterwards"""
+    conn = connect()
+    created = []
+
+    def _users(count):
+        with conn.cursor() as cur:
+            for _ in range(count):
+                username = f"test_race_{uuid.uuid4().hex[:12]}"
+                cur.execute(
+                    "INSERT INTO users (username, password_hash) VALUES (%s, 'test') RETURNING id",
+                    (username,)
+                )
+                created.append((str(cur.fetchone()[0]), username))
+        conn.commit()
+        return created[-count:]
+
+    yield _users
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE id = ANY(%s::uuid[])", ([user_id for user_id, _ in created],))
+    conn.commit()
+
+
+def test_concurrent_get_or_create_makes_one_conversation(connect, users):
+    sides = [connect(), connect()]
+    barrier = threading.Barrier(2)
+
+    for _ in range(RACE_ROUNDS):
+        (alice_id, alice), (bob_id, bob) = users(2)
+        results = [None, None]
+        errors = []
+
+        def start(slot, conn, user_id, peer):
+            try:
+                barrier.wait()
+                results[slot] = ChatSystem(conn, user_id).get_or_create_conversation(user_id, peer)
+            except Exception as e:
+                errors.append(e)
+                barrier.abort()
+
+        threads = [
+            threading.Thread(target=start, args=(0, sides[0], alice_id, bob)),
+            threading.Thread(target=start, args=(1, sides[1], bob_id, alice)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert results[0] is not None and results[0] == results[1]
+        with sides[0].cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM conversations WHERE participant_1 = LEAST(%s::uuid, %s::uuid) "
+                "AND participant_2 = GREATEST(%s::uuid, %s::uuid)",
+                (alice_id, bob_id, alice_id, bob_id)
+            )
+            assert cur.fetchone()[0] == 1
+        sides[0].rollback()
@@ -0,0 +1,161 @@
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from query_registry import QueryRegistry
+
+
+class FakeConnection:
+    def __init__(self, prepared=None, autocommit=True):
+        self.autocommit = autocommit
+        if prepared is not None:
+            self.prepared = prepared
+
+
+def server_error(pgcode):
+    """A psycopg2 error carrying `pgcode`, as the server would raise it"""
+    return type(f"Error{pgcode}", (psycopg2.Error,), {"pgcode": pgcode})()
+
+
+class FakeCursor:
+    """Formats SQL the way psycopg2 does (%s and %% with a params tuple) and records it.
+
+    `errors` are raised, in order, by the next executes (None lets one succeed).
+    """
+
+    def __init__(self, connection, errors=()):
+        self.connection = connection
+        self.errors = list(errors)
+        self.sent = []
+
+    def execute(self, sql, params=None):
+        if params is not None:
+            sql = sql % tuple(repr(p) for p in params)
+        self.sent.append(sql)
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+
+
+def test_first_call_prepares_and_executes_in_one_round_trip():
+    registry = QueryRegistry()
+    registry.register("by_id", "SELECT * FROM users WHERE id = %s AND username LIKE 'a%%'")
+    conn = FakeConnection(prepared=set())
+    cur = FakeCursor(conn)
+
+    registry.execute(cur, "by_id", ("u1",))
+
+    assert cur.sent == [
+        "PREPARE by_id AS SELECT * FROM users WHERE id = $1 AND username LIKE 'a%'; EXECUTE by_id ('u1')"
+    ]
+    assert conn.prepared == {"by_id"}
+
+
+def test_repeat_call_only_executes():
+    registry = QueryRegistry()
+    registry.register("pair", "SELECT %s, %s")
+    conn = FakeConnection(prepared=set())
+    cur = FakeCursor(conn)
+
+    registry.execute(cur, "pair", (1, 2))
+    registry.execute(cur, "pair", (3, 4))
+
+    assert cur.sent[1] == "EXECUTE pair (3, 4)"
+    stats = registry.stats()["pair"]
+    assert stats["calls"] == 2
+    assert stats["prepares"] == 1
+
+
+def test_statement_without_params():
+    registry = QueryRegistry()
+    registry.register("now", "SELECT NOW()")
+    cur = FakeCursor(FakeConnection(prepared=set()))
+
+    registry.execute(cur, "now")
+    registry.execute(cur, "now")
+
+    assert cur.sent == ["PREPARE now AS SELECT NOW(); EXECUTE now", "EXECUTE now"]
+
+
+def test_connection_without_prepared_set_runs_plain_sql():
+    registry = QueryRegistry()
+    registry.register("by_id", "SELECT * FROM users WHERE id = %s")
+    cur = FakeCursor(FakeConnection())
+
+    registry.execute(cur, "by_id", ("u1",))
+
+    assert cur.sent == ["SELECT * FROM users WHERE id = 'u1'"]
+
+
+def test_first_call_in_a_transaction_fences_prepare_in_a_savepoint():
+    registry = QueryRegistry()
+    registry.register("now", "SELECT NOW()")
+    conn = FakeConnection(prepared=set(), autocommit=False)
+    cur = FakeCursor(conn)
+
+    registry.execute(cur, "now")
+
+    assert cur.sent == [
+        "SAVEPOINT query_registry_prepare; PREPARE now AS SELECT NOW(); "
+        "RELEASE SAVEPOINT query_registry_prepare; EXECUTE now"
+    ]
+    assert conn.prepared == {"now"}
+
+
+def test_aborted_transaction_does_not_record_the_statement():
+    registry = QueryRegistry()
+    registry.register("now", "SELECT NOW()")
+    conn = FakeConnection(prepared=set(), autocommit=False)
+    cur = FakeCursor(conn, errors=[server_error("25P02")])
+
+    with pytest.raises(psycopg2.Error):
+        registry.execute(cur, "now")
+    assert conn.prepared == set()
+
+    # After the caller's rollback the next call prepares again
+    registry.execute(cur, "now")
+    assert cur.sent[1].startswith("SAVEPOINT query_registry_prepare; PREPARE now AS")
+    assert conn.prepared == {"now"}
+
+
+def test_failed_execute_after_prepare_is_recovered_on_duplicate():
+    registry = QueryRegistry()
+    registry.register("by_id", "SELECT * FROM users WHERE id = %s")
+    conn = FakeConnection(prepared=set(), autocommit=False)
+    cur = FakeCursor(conn, errors=[server_error("22P02"), server_error("42P05")])
+
+    with pytest.raises(psycopg2.Error):
+        registry.execute(cur, "by_id", ("not-a-uuid",))
+    assert conn.prepared == set()
+
+    registry.execute(cur, "by_id", ("u1",))
+    assert cur.sent[-1] == (
+        "ROLLBACK TO SAVEPOINT query_registry_prepare; RELEASE SAVEPOINT query_registry_prepare; "
+        "EXECUTE by_id ('u1')"
+    )
+    assert conn.prepared == {"by_id"}
+    assert registry.stats()["by_id"]["prepares"] == 0
+
+
+def test_lost_statement_is_prepared_again():
+    registry = QueryRegistry()
+    registry.register("now", "SELECT NOW()")
+    conn = FakeConnection(prepared={"now"})
+    cur = FakeCursor(conn, errors=[server_error("26000")])
+
+    registry.execute(cur, "now")
+
+    assert cur.sent == ["EXECUTE now", "PREPARE now AS SELECT NOW(); EXECUTE now"]
+    assert conn.prepared == {"now"}
+
+
+def test_lost_statement_in_a_transaction_is_forgotten_and_raised():
+    registry = QueryRegistry()
+    registry.register("now", "SELECT NOW()")
+    conn = FakeConnection(prepared={"now"}, autocommit=False)
+    cur = FakeCursor(conn, errors=[server_error("26000")])
+
+    with pytest.raises(psycopg2.Error):
+        registry.execute(cur, "now")
+    assert conn.prepared == set()
@@ -0,0 +1,41 @@
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(path=str(tmp_path / "session"), secret="test-secret")
+
+
+def write(store, **fields):
+    expires = int(time.time()) + 3600
+    data = {"token": "abc", "expires": expires, "sig": store._sign("abc", expires)}
+    data.update(fields)
+    with open(store.path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+
+
+def test_valid_file_loads(store):
+    write(store)
+    assert store.load() is not None
+
+
+@pytest.mark.parametrize("fields", [
+    {"sig": 12},
+    {"sig": None},
+    {"sig": "é"},
+    {"token": 5},
+    {"token": None},
+    {"expires": 1},
+])
+def test_tampered_or_expired_file_is_an_invalid_session(store, fields):
+    write(store, **fields)
+    assert store.load() is None
+    assert not os.path.exists(store.path)